@@ -0,0 +1,66 @@
+"""
+Per-request overhead of the auth dependency, Auth.get_current_user, with the user already in the
+in-process user cache, so only token verification is measured.
+
+    python -m benchmarks.bench_auth --requests 20000
+
+jose (str key): the previous code, jose.jwt.decode with the secret as a string on every request.
+The other rows use the prebuilt key objects of src.services.tokens, with and without the verified-token
+cache. Every request sends the same token, as a client does for the life of its access token.
+"""
+import argparse
+import asyncio
+import time
+
+from jose import jwt as jose_jwt
+
+from src.database.models import User
+from src.services.auth import Auth
+from src.services.cache import user_cache
+from src.services.tokens import JoseBackend, PyJWTBackend, TokenVerifier
+
+SECRET = "benchmark_secret_key_0123456789_abcdef"
+ALGORITHM = "HS256"
+
+
+class StringKeyJose(JoseBackend):
+
+    def decode(self, token: str) -> dict:
+        return jose_jwt.decode(token, SECRET, algorithms=[ALGORITHM])
+
+
+class Uncached(TokenVerifier):
+
+    def decode(self, token: str) -> dict:
+        return self.backend.decode(token)
+
+
+async def bench(name: str, verifier: TokenVerifier, requests: int) -> float:
+    auth = Auth()
+    auth.tokens = verifier
+    token = await auth.create_access_token({"sub": "bench_user"}, expires_delta=3600)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await auth.get_current_user(token, db=None)
+    elapsed = time.perf_counter() - start
+    print(f"{name:22} {elapsed / requests * 1e6:7.1f} us per request")
+    return elapsed
+
+
+async def run(args):
+    user_cache.set("bench_user", User(id=1, username="bench_user", email="bench@example.com", confirmed=True))
+    variants = [
+        ("jose (str key)", Uncached(StringKeyJose(SECRET, ALGORITHM), 1, 1)),
+        ("jose", Uncached(JoseBackend(SECRET, ALGORITHM), 1, 1)),
+        ("jose + cache", TokenVerifier(JoseBackend(SECRET, ALGORITHM), 4096, 900)),
+        ("pyjwt", Uncached(PyJWTBackend(SECRET, ALGORITHM), 1, 1)),
+        ("pyjwt + cache", TokenVerifier(PyJWTBackend(SECRET, ALGORITHM), 4096, 900)),
+    ]
+    for name, verifier in variants:
+        await bench(name, verifier, args.requests)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""
+Event loop stalls and stored bytes of avatar uploads, offline with the local storage backend.
+
+    python -m benchmarks.bench_avatar --uploads 16 --width 4000 --height 3000 --bandwidth 10
+
+The storage writes to a temporary directory and then blocks for as long as sending the file
+at --bandwidth MB/s would take, standing in for the blocking upload to Cloudinary.
+inline: the old handler, the original file is stored straight from the event loop.
+pool: the original is resized to avatar_size and stored in the avatar pool.
+A heartbeat task ticks every millisecond while the uploads run; its largest delay is how long
+the event loop could not serve any other request.
+"""
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+
+from PIL import Image
+
+from src.services.avatars import LocalStorage, avatar_pool, process_avatar
+
+
+def make_photo(width: int, height: int) -> bytes:
+    output = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(output, "JPEG", quality=92)
+    return output.getvalue()
+
+
+class UploadStorage(LocalStorage):
+
+    def __init__(self, directory: str, bandwidth: float):
+        super().__init__(directory, "/media/avatars")
+        self.bandwidth = bandwidth
+
+    def save(self, name: str, data: bytes) -> str:
+        time.sleep(len(data) / (self.bandwidth * 1024 * 1024))
+        return super().save(name, data)
+
+
+async def heartbeat(stalls: list, interval: float = 0.001):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - start - interval)
+
+
+async def measure(name: str, upload, uploads: int, storage: UploadStorage):
+    stalls = []
+    ticker = asyncio.create_task(heartbeat(stalls))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await asyncio.gather(*(upload(f"user{i}") for i in range(uploads)))
+    elapsed = time.perf_counter() - start
+    # let the heartbeat record the stall it is waking up from
+    await asyncio.sleep(0.01)
+    ticker.cancel()
+    stored = sum(os.path.getsize(storage.directory / f"user{i}.jpg") for i in range(uploads))
+    print(f"{name:7} {uploads} uploads in {elapsed:.2f}s, longest loop stall {max(stalls) * 1000:.0f} ms, "
+          f"stored {stored / uploads / 1024:.0f} KiB per avatar")
+
+
+async def run(args):
+    photo = make_photo(args.width, args.height)
+    print(f"original: {args.width}x{args.height} JPEG, {len(photo) / 1024:.0f} KiB")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = UploadStorage(os.path.join(tmp, "inline"), args.bandwidth)
+
+        async def inline(name):
+            storage.save(name, photo)
+
+        await measure("inline", inline, args.uploads, storage)
+
+        storage = UploadStorage(os.path.join(tmp, "pool"), args.bandwidth)
+
+        async def pooled(name):
+            await avatar_pool.run(process_avatar, photo, name, storage)
+
+        await measure("pool", pooled, args.uploads, storage)
+    avatar_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=16, help="at most avatar_pool_max_pending")
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--bandwidth", type=float, default=10, help="upload speed to the storage in MB/s")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""
+Cost of turning confirmation emails into MIME messages, without sending them.
+
+    python -m benchmarks.bench_email_render --messages 2000
+
+fastapi-mail: the old send_email path, FastMail(conf) per message with the template engine built by the
+config, which creates a jinja Environment and compiles the template again for every message.
+outbox: build_messages of the outbox worker over batches, with the templates compiled once.
+Both sides sign one email token per message, the --no-token flag leaves it out to show rendering alone.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+from pydantic import EmailStr
+
+from src.database.models import EmailOutbox
+from src.services.auth import auth_service
+from src.services.outbox import build_messages
+from src.services.email import TEMPLATE_FOLDER
+from src.services.rendering import renderer
+from src.conf.config import settings
+
+HOST = "http://localhost:8000/"
+TEMPLATE = "email_template.html"
+
+
+def context(i: int, token: bool) -> dict:
+    email = f"user{i}@example.com"
+    return {"host": HOST, "username": f"user{i}",
+            "token": auth_service.create_email_token({"sub": email}) if token else "token"}
+
+
+def mail_config() -> ConnectionConfig:
+    # the config of the old send_email path, the application no longer uses fastapi-mail
+    return ConnectionConfig(
+        MAIL_USERNAME=settings.mail_username,
+        MAIL_PASSWORD=settings.mail_password,
+        MAIL_FROM=EmailStr(settings.mail_username),
+        MAIL_PORT=settings.mail_port,
+        MAIL_SERVER=settings.mail_server,
+        MAIL_FROM_NAME="My contacts app",
+        MAIL_STARTTLS=settings.mail_starttls,
+        MAIL_SSL_TLS=settings.mail_ssl_tls,
+        USE_CREDENTIALS=settings.mail_use_credentials,
+        VALIDATE_CERTS=settings.mail_validate_certs,
+        TEMPLATE_FOLDER=TEMPLATE_FOLDER,
+    )
+
+
+async def bench_fastapi_mail(messages: int, token: bool) -> float:
+    conf = mail_config()
+    start = time.perf_counter()
+    for i in range(messages):
+        message = MessageSchema(subject="Confirm your email ", recipients=[f"user{i}@example.com"],
+                                template_body=context(i, token), subtype=MessageType.html)
+        fm = FastMail(conf)
+        template = await fm.get_mail_template(conf.template_engine(), TEMPLATE)
+        await fm._FastMail__prepare_message(message, template)
+    return time.perf_counter() - start
+
+
+def bench_outbox(messages: int, batch_size: int, token: bool) -> float:
+    start = time.perf_counter()
+    renderer.compile()
+    for offset in range(0, messages, batch_size):
+        batch = [EmailOutbox(id=i, recipient=f"user{i}@example.com", subject="Confirm your email ",
+                             template_name=TEMPLATE, template_body=json.dumps(context(i, token)))
+                 for i in range(offset, min(offset + batch_size, messages))]
+        build_messages(batch)
+    return time.perf_counter() - start
+
+
+async def run(args):
+    token = not args.no_token
+    baseline = await bench_fastapi_mail(args.messages, token)
+    print(f"fastapi-mail: {args.messages} messages in {baseline:.2f}s ({args.messages / baseline:.0f} msg/s)")
+    elapsed = bench_outbox(args.messages, args.batch_size, token)
+    print(f"outbox:       {args.messages} messages in {elapsed:.2f}s ({args.messages / elapsed:.0f} msg/s), "
+          f"{baseline / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--no-token", action="store_true", help="do not sign an email token per message")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,55 @@
+"""
+Time to import the application, what every worker pays before it serves a request.
+
+    python -m benchmarks.bench_importtime --runs 10
+
+Runs python -X importtime -c "import main" in fresh interpreters and reports the median of the total
+and the heaviest packages by the time spent importing their own modules, in milliseconds.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+
+def import_times() -> tuple[float, dict[str, float]]:
+    """
+    :return: The cumulative time of import main and the self time of every package it loaded, in milliseconds
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], capture_output=True,
+                            text=True, check=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+    total, packages = 0.0, defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if name == "main":
+            total = int(cumulative) / 1000
+        else:
+            packages[name.split(".")[0]] += int(own) / 1000
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    import_times()  # warm the bytecode and file system caches
+    runs = [import_times() for _ in range(args.runs)]
+    totals = [total for total, _ in runs]
+    packages = defaultdict(list)
+    for _, run in runs:
+        for name, elapsed in run.items():
+            packages[name].append(elapsed)
+    print(f"import main: median {statistics.median(totals):.0f} ms, min {min(totals):.0f} ms ({args.runs} runs)")
+    heaviest = sorted(((statistics.median(times), name) for name, times in packages.items()), reverse=True)
+    for elapsed, name in heaviest[:args.top]:
+        print(f"  {name:<24} {elapsed:7.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Login throughput while the same worker serves contacts traffic.
+
+    python -m benchmarks.bench_login --logins 50 --concurrency 8
+    python -m benchmarks.bench_login --inline   # bcrypt on the event loop, for comparison
+
+The app runs in-process against a temporary sqlite database, so no server, redis or postgres is needed.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import setup_app, PASSWORD
+from main import app
+from src.routes import auth
+from src.services import hashing
+
+
+async def contacts_traffic(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/contacts/")
+        latencies.append(time.perf_counter() - start)
+
+
+async def login_worker(client: httpx.AsyncClient, queue: asyncio.Queue, statuses: list):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        response = await client.post("/auth/login", data={"username": "bench_user", "password": PASSWORD})
+        statuses.append(response.status_code)
+
+
+async def run(args):
+    if args.inline:
+        async def run_inline(func, *func_args):
+            return func(*func_args)
+        hashing.hashing_pool.run = run_inline
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, _, _ = await setup_app(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        # every login comes from the same address
+        app.dependency_overrides[auth.login_limit] = lambda: None
+        async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+            stop = asyncio.Event()
+            latencies, statuses = [], []
+            traffic = [asyncio.create_task(contacts_traffic(client, stop, latencies)) for _ in range(4)]
+
+            queue = asyncio.Queue()
+            for _ in range(args.logins):
+                queue.put_nowait(None)
+            start = time.perf_counter()
+            await asyncio.gather(*(login_worker(client, queue, statuses) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - start
+
+            stop.set()
+            await asyncio.gather(*traffic)
+        await engine.dispose()
+
+    latencies.sort()
+    print(f"mode:                {'inline' if args.inline else hashing.hashing_pool.kind + ' pool'}")
+    print(f"logins:              {len(statuses)} in {elapsed:.2f}s ({len(statuses) / elapsed:.1f}/s)")
+    print(f"login statuses:      { {code: statuses.count(code) for code in set(statuses)} }")
+    print(f"contacts requests:   {len(latencies)} ({len(latencies) / elapsed:.1f}/s)")
+    if latencies:
+        print(f"contacts p50 / p99:  {statistics.median(latencies) * 1000:.1f} ms / "
+              f"{latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--inline", action="store_true", help="hash on the event loop instead of the pool")
+    logging.disable(logging.WARNING)
+    asyncio.run(run(parser.parse_args()))
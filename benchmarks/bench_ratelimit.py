@@ -0,0 +1,109 @@
+"""
+Per-request overhead of the rate limiter under load, offline: redis is simulated in-process and every
+round trip to it waits --rtt milliseconds, standing in for the network hop to a real server.
+
+    python -m benchmarks.bench_ratelimit --clients 50 --requests 200 --rtt 0.5
+
+--clients concurrent clients each send --requests requests through RateLimiter.check.
+well-behaved: the clients stay under their limit, every request is counted in redis.
+abusers: the limit is 10 requests a minute, so nearly every request is rejected.
+redis: the sliding window in redis alone, one pipelined round trip per request, as the previous
+limiter's one Lua script call per request.
+local+redis: the token bucket of the worker answers for clients that used up their limit.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from src.services import ratelimit
+from src.services.ratelimit import RateLimiter
+from src.conf.config import settings
+
+
+class SimulatedPipeline:
+
+    def __init__(self, redis: "SimulatedRedis"):
+        self.redis = redis
+        self.commands = []
+
+    def incr(self, key):
+        self.commands.append(("incr", key))
+        return self
+
+    def expire(self, key, seconds):
+        self.commands.append(("expire", key))
+        return self
+
+    def get(self, key):
+        self.commands.append(("get", key))
+        return self
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        await asyncio.sleep(self.redis.rtt)
+        results = []
+        for command, key in self.commands:
+            if command == "incr":
+                self.redis.data[key] = self.redis.data.get(key, 0) + 1
+                results.append(self.redis.data[key])
+            elif command == "expire":
+                results.append(True)
+            else:
+                results.append(self.redis.data.get(key))
+        return results
+
+
+class SimulatedRedis:
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.data = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction: bool = True):
+        return SimulatedPipeline(self)
+
+
+async def client(limiter: RateLimiter, identity: str, requests: int, latencies: list, statuses: list):
+    for _ in range(requests):
+        start = time.perf_counter()
+        try:
+            await limiter.check(identity)
+            statuses.append(200)
+        except Exception:
+            statuses.append(429)
+        latencies.append(time.perf_counter() - start)
+
+
+async def measure(name: str, limit: str, local: bool, args):
+    redis = SimulatedRedis(args.rtt / 1000)
+    ratelimit.redis_client = redis
+    settings.rate_limits = {"bench": limit}
+    limiter = RateLimiter("bench", local=local)
+    latencies, statuses = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(limiter, f"user:{i}", args.requests, latencies, statuses)
+                           for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{name:29} {len(statuses) / elapsed:9.0f} req/s, "
+          f"mean {sum(latencies) / len(latencies) * 1e6:7.0f} us, p99 {latencies[int(len(latencies) * 0.99)] * 1e6:7.0f} us, "
+          f"{redis.round_trips / len(statuses):.2f} round trips/request, {statuses.count(429)} rejected")
+
+
+async def run(args):
+    print(f"{args.clients} clients x {args.requests} requests, simulated redis round trip {args.rtt} ms")
+    await measure("well-behaved, redis", "1000000/60", False, args)
+    await measure("well-behaved, local+redis", "1000000/60", True, args)
+    await measure("abusers, redis", "10/60", False, args)
+    await measure("abusers, local+redis", "10/60", True, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rtt", type=float, default=0.5, help="redis round trip in ms")
+    logging.disable(logging.WARNING)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,39 @@
+"""
+Shared setup for the benchmarks: the app runs in-process against a temporary sqlite database.
+"""
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from main import app
+from src.database.connect import get_db
+from src.database.models import Base, User
+from src.services import hashing
+from src.services.auth import auth_service
+
+PASSWORD = "123456789"
+
+
+async def setup_app(url: str):
+    """
+    The setup_app function creates the tables and a confirmed user, points get_db at the database
+    and authenticates every request as that user.
+
+    :param url: str: Async database url
+    :return: The engine, the session maker and the user
+    """
+    engine = create_async_engine(url, connect_args={"timeout": 60})
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_maker() as db:
+        user = User(username="bench_user", email="bench@example.com", password=hashing.hash_password(PASSWORD),
+                    confirmed=True)
+        db.add(user)
+        await db.commit()
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[auth_service.get_current_user] = lambda: user
+    return engine, session_maker, user
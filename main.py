@@ -1,19 +1,35 @@
+import logging
 
-import redis.asyncio as redis
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi_limiter import FastAPILimiter
+from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.connect import get_db
-from src.routes import contacts, auth, users
+from src.routes import contacts, auth, users, internal, health
+from src.services.hashing import hashing_pool
+from src.services.avatars import avatar_pool
+from src.services.revocation import revocation_list
+from src.services.health import health_checker
+from src.services.metrics import InstrumentedRoute, MetricsMiddleware, request_metrics
+from src.services.querylog import QueryLogMiddleware
+from src.services.clients import clients
 from src.conf.config import settings
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI()
+app.router.route_class = InstrumentedRoute
 app.include_router(auth.router)
 app.include_router(contacts.router)
 app.include_router(users.router, prefix='/api')
+app.include_router(internal.router)
+app.include_router(health.router)
+
+if settings.avatar_storage == "local":
+    app.mount(settings.avatar_local_url, StaticFiles(directory=settings.avatar_local_dir, check_dir=False),
+              name="avatars")
 
 origins = [
     "http://localhost:3000"
@@ -26,26 +42,39 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.query_debug:
+    app.add_middleware(QueryLogMiddleware, repeat_threshold=settings.query_repeat_threshold)
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
 
 
 @app.on_event("startup")
 async def startup():
-    r = await redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0, encoding="utf-8",
-                          decode_responses=True)
-    await FastAPILimiter.init(r)
+    clients.open()
+    revocation_list.start()
+    health_checker.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await revocation_list.stop()
+    await health_checker.stop()
+    await clients.close()
+    hashing_pool.shutdown()
+    avatar_pool.shutdown()
 
 
 @app.get("/api/healthchecker")
-def healthchecker(db: Session = Depends(get_db)):
+async def healthchecker(db: AsyncSession = Depends(get_db)):
     try:
         # Make request
-        result = db.execute(text("SELECT 1")).fetchone()
+        result = await db.execute(text("SELECT 1"))
+        result = result.fetchone()
         if result is None:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                                 detail="Database is not configured correctly")
         return {"message": "Welcome to FastAPI!"}
-    except Exception as e:
-        print(e)
+    except Exception:
+        logger.exception("Database health check failed")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                             detail="Error connecting to the database")
 
@@ -0,0 +1,35 @@
+"""contacts_search_trgm
+
+Revision ID: 2e8d4a6f13c0
+Revises: 9c3e7d51a2b8
+Create Date: 2026-10-16 12:21:05.774630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e8d4a6f13c0'
+down_revision = '9c3e7d51a2b8'
+branch_labels = None
+depends_on = None
+
+SEARCH_FIELDS = ('first_name', 'second_name', 'email')
+
+
+def upgrade() -> None:
+    # SQLite databases get the contacts_fts table from the metadata instead, see src.database.models
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in SEARCH_FIELDS:
+        op.create_index(f'ix_contacts_{field}_trgm', 'contacts', [field], unique=False,
+                        postgresql_using='gin', postgresql_ops={field: 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        op.drop_index(f'ix_contacts_{field}_trgm', table_name='contacts')
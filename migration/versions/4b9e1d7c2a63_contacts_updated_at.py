@@ -0,0 +1,30 @@
+"""contacts_updated_at
+
+Revision ID: 4b9e1d7c2a63
+Revises: 7f4a2c9e8d15
+Create Date: 2026-10-16 14:21:09.518304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b9e1d7c2a63'
+down_revision = '7f4a2c9e8d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    contacts = sa.table('contacts', sa.column('updated_at', sa.DateTime))
+    op.execute(contacts.update().values(updated_at=sa.func.now()))
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+    op.create_index('ix_contacts_user_id_updated_at', 'contacts', ['user_id', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_updated_at', table_name='contacts')
+    op.drop_column('contacts', 'updated_at')
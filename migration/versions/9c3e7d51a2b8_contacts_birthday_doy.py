@@ -0,0 +1,38 @@
+"""contacts_birthday_doy
+
+Revision ID: 9c3e7d51a2b8
+Revises: 5b1f0c2e9a47
+Create Date: 2026-10-16 11:04:27.301915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3e7d51a2b8'
+down_revision = '5b1f0c2e9a47'
+branch_labels = None
+depends_on = None
+
+# days before the first day of every month in a leap year
+DAYS_BEFORE_MONTH = {1: 0, 2: 31, 3: 60, 4: 91, 5: 121, 6: 152, 7: 182, 8: 213, 9: 244, 10: 274, 11: 305, 12: 335}
+
+
+def upgrade() -> None:
+    op.add_column('contacts', sa.Column('birthday_doy', sa.SmallInteger(), nullable=True))
+    contacts = sa.table('contacts', sa.column('birthday', sa.Date), sa.column('birthday_doy', sa.SmallInteger))
+    op.execute(
+        contacts.update().values(
+            birthday_doy=sa.case(DAYS_BEFORE_MONTH, value=sa.extract('month', contacts.c.birthday))
+            + sa.extract('day', contacts.c.birthday)
+        )
+    )
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.alter_column('birthday_doy', existing_type=sa.SmallInteger(), nullable=False)
+    op.create_index('ix_contacts_user_id_birthday_doy', 'contacts', ['user_id', 'birthday_doy'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_birthday_doy', table_name='contacts')
+    op.drop_column('contacts', 'birthday_doy')
@@ -0,0 +1,51 @@
+"""contacts_change_seq
+
+Revision ID: c81f3a5e6d27
+Revises: 4b9e1d7c2a63
+Create Date: 2026-10-16 15:07:42.663120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81f3a5e6d27'
+down_revision = '4b9e1d7c2a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('contact_tombstones',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('contact_id', sa.Integer(), nullable=False),
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('change_seq', sa.Integer(), nullable=False),
+                    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+                    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index('ix_contact_tombstones_user_id_change_seq', 'contact_tombstones', ['user_id', 'change_seq'],
+                    unique=False)
+
+    # existing contacts enter the sequence in the order they were created
+    op.add_column('contacts', sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('users', sa.Column('contacts_seq', sa.Integer(), nullable=False, server_default='0'))
+    contacts = sa.table('contacts', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                        sa.column('change_seq', sa.Integer))
+    users = sa.table('users', sa.column('id', sa.Integer), sa.column('contacts_seq', sa.Integer))
+    op.execute(contacts.update().values(change_seq=contacts.c.id))
+    op.execute(users.update().values(
+        contacts_seq=sa.select(sa.func.coalesce(sa.func.max(contacts.c.id), 0))
+        .where(contacts.c.user_id == users.c.id).scalar_subquery()
+    ))
+    op.create_index('ix_contacts_user_id_change_seq', 'contacts', ['user_id', 'change_seq'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_change_seq', table_name='contacts')
+    op.drop_column('users', 'contacts_seq')
+    op.drop_column('contacts', 'change_seq')
+    op.drop_index('ix_contact_tombstones_user_id_change_seq', table_name='contact_tombstones')
+    op.drop_table('contact_tombstones')
@@ -0,0 +1,31 @@
+"""contacts_drop_updated_at
+
+Revision ID: e2b7c4d90f31
+Revises: a3d95b7f0e12
+Create Date: 2026-10-16 23:42:18.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7c4d90f31'
+down_revision = 'a3d95b7f0e12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the contacts ETag is built from users.contacts_seq, which does not depend on the clocks of the workers
+    op.drop_index('ix_contacts_user_id_updated_at', table_name='contacts')
+    op.drop_column('contacts', 'updated_at')
+
+
+def downgrade() -> None:
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    contacts = sa.table('contacts', sa.column('updated_at', sa.DateTime))
+    op.execute(contacts.update().values(updated_at=sa.func.timezone('UTC', sa.func.now())))
+    with op.batch_alter_table('contacts') as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+    op.create_index('ix_contacts_user_id_updated_at', 'contacts', ['user_id', 'updated_at'], unique=False)
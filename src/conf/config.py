@@ -3,21 +3,92 @@ from pydantic import BaseSettings
 
 class Settings(BaseSettings):
     postgres_url: str = "db_URL"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout: int = 0
+    # development and test mode: fingerprint the queries of every request, log slow and repeated ones
+    query_debug: bool = False
+    slow_query_threshold: float = 0.1
+    query_repeat_threshold: int = 5
     secret_key_jwt: str = "secret_key"
     algorithm: str = "HS256"
+    jwt_backend: str = "jose"
+    token_cache_size: int = 4096
+    token_cache_ttl: int = 900
+    revocation_refresh_interval: float = 5
+    revocation_bloom_capacity: int = 100000
+    revocation_bloom_error_rate: float = 0.01
+
+    hash_pool_kind: str = "thread"
+    hash_pool_workers: int = 4
+    hash_pool_max_pending: int = 64
 
     mail_username: str = "mail@meta.ua"
     mail_password: str = "password"
     mail_from: str = "mail@meta.ua"
     mail_port: int = 465
     mail_server: str = "smtp.meta.ua"
+    mail_ssl_tls: bool = True
+    mail_starttls: bool = False
+    mail_use_credentials: bool = True
+    mail_validate_certs: bool = True
+
+    outbox_batch_size: int = 50
+    outbox_poll_interval: float = 1.0
+    outbox_max_attempts: int = 8
+    outbox_retry_base: float = 30
+    outbox_retry_max: float = 3600
+
+    contacts_import_batch_size: int = 1000
 
     redis_host: str = "localhost"
     redis_port: int = 6379
+    redis_max_connections: int = 50
+
+    user_cache_ttl: int = 900
+    user_cache_l1_size: int = 1024
+    user_cache_l1_ttl: int = 30
+    contacts_cache_ttl: int = 300
+
+    # /internal answers requests with Authorization: Bearer <internal_token> or from the client addresses
+    # in internal_allowed_hosts. Neither is set by default, so the endpoints are closed until configured.
+    internal_token: str | None = None
+    internal_allowed_hosts: list[str] = []
+
+    health_check_interval: float = 5
+    health_check_timeout: float = 2
+    # checks that have to pass for the worker to be ready, the others are only reported
+    health_required_checks: list[str] = ["db"]
+
+    # requests/seconds per policy, counted per user or, before logging in, per client ip address
+    rate_limits: dict[str, str] = {
+        "auth_signup": "10/3600",
+        "auth_login": "20/60",
+        "auth_request_email": "5/3600",
+        "contacts_create": "3/60",
+        "contacts_import": "10/60",
+        "contacts_batch": "60/60",
+    }
+    # per username, policies that replace the ones in rate_limits for that user
+    rate_limit_overrides: dict[str, dict[str, str]] = {}
+    rate_limit_local: bool = True
+    rate_limit_local_size: int = 10000
+
+    avatar_storage: str = "cloudinary"
+    avatar_local_dir: str = "media/avatars"
+    avatar_local_url: str = "/media/avatars"
+    avatar_size: int = 250
+    avatar_max_bytes: int = 5 * 1024 * 1024
+    avatar_pool_workers: int = 2
+    avatar_pool_max_pending: int = 16
 
-    cloudinary_name: str
-    cloudinary_api_key: str
-    cloudinary_api_secret: str
+    # required only when avatar_storage is cloudinary, checked when the storage is first used
+    cloudinary_name: str | None = None
+    cloudinary_api_key: str | None = None
+    cloudinary_api_secret: str | None = None
 
     class Config:
         env_file = ".env"
@@ -1,20 +1,110 @@
-import configparser
-import pathlib
+from time import perf_counter
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.conf.config import settings
+from src.services.clients import clients
+from src.services.metrics import Histogram, instrument_engine
+from src.services.querylog import instrument_queries
 
 DATABASE_URL = settings.postgres_url
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+def get_async_url(url: str) -> str:
+    """
+    The get_async_url function converts the synchronous database url used by alembic
+    into the url of the matching asyncio driver used by the application.
+
+    :param url: str: Database url from the settings
+    :return: The same url with an asyncio driver
+    """
+    url = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url.drivername, url.drivername)
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long every checkout waited for a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = Histogram()
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.wait_time.observe(perf_counter() - start)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait_time = self.wait_time
+        return pool
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            # overflow() counts from -pool_size while the pool is still filling up
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "wait_time": self.wait_time.snapshot(),
+        }
+
+
+def get_engine_options(url: str) -> dict:
+    """
+    The get_engine_options function builds the pool and connection options of the engine from the settings.
+
+    :param url: str: Async database url
+    :return: Keyword arguments for create_async_engine
+    """
+    options = {
+        "poolclass": InstrumentedPool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if settings.db_statement_timeout and make_url(url).drivername == "postgresql+asyncpg":
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(settings.db_statement_timeout)}}
+    return options
+
+
+def create_db_engine() -> AsyncEngine:
+    """
+    The create_db_engine function creates the engine of the worker, which loads the database driver,
+    and hooks the request metrics and, in query_debug mode, the query log into it.
+
+    :return: The async engine
+    """
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **get_engine_options(ASYNC_DATABASE_URL))
+    instrument_engine(async_engine.sync_engine)
+    if settings.query_debug:
+        instrument_queries(async_engine.sync_engine, settings.slow_query_threshold)
+    return async_engine
+
+
+ASYNC_DATABASE_URL = get_async_url(DATABASE_URL)
+
+engine = clients.register("db", create_db_engine, close=lambda async_engine: async_engine.dispose())
+SessionLocal = clients.register("db_sessions", lambda: async_sessionmaker(clients.get("db"), class_=AsyncSession,
+                                                                          autoflush=False, expire_on_commit=False))
+
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
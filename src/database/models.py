@@ -1,11 +1,28 @@
-from sqlalchemy import Column, Integer, String, Date, Text, ForeignKey, func
-from sqlalchemy.orm import relationship
+from datetime import date, datetime
+
+from sqlalchemy import Column, Integer, SmallInteger, String, Date, Text, ForeignKey, Index, DDL, event, func
+from sqlalchemy.orm import relationship, backref
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql.sqltypes import DateTime, Boolean
 
 Base = declarative_base()
 
 
+def birthday_doy(birthday: date) -> int:
+    """
+    The birthday_doy function returns the day of the year of a birthday counted in a leap year,
+    so every month and day, including February 29, has the same number in every year.
+
+    :param birthday: date: The birthday
+    :return: The day of the year from 1 to 366
+    """
+    return date(2000, birthday.month, birthday.day).timetuple().tm_yday
+
+
+def default_birthday_doy(context) -> int:
+    return birthday_doy(context.get_current_parameters()["birthday"])
+
+
 class Contact(Base):
     __tablename__ = "contacts"
 
@@ -15,10 +32,48 @@ class Contact(Base):
     email = Column(String(100), nullable=False, unique=True, index=True)
     phone_number = Column(String(100), nullable=False, unique=True)
     birthday = Column(Date, nullable=False)
+    birthday_doy = Column(SmallInteger, nullable=False, default=default_birthday_doy)
     additional_info = Column(Text, nullable=True)
     user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), default=None)
+    # position of the latest change of the contact in the owner's change sequence, see User.contacts_seq
+    change_seq = Column(Integer, nullable=False, default=0)
+
+    # lazy="raise" on both sides: the relationships must be loaded explicitly, never one query per row
+    user = relationship('User', backref=backref("contacts", lazy="raise"), lazy="raise")
+
+    __table_args__ = (
+        Index('ix_contacts_user_id_id', 'user_id', 'id'),
+        Index('ix_contacts_user_id_birthday_doy', 'user_id', 'birthday_doy'),
+        Index('ix_contacts_user_id_second_name_first_name', 'user_id', 'second_name', 'first_name'),
+        Index('ix_contacts_user_id_email', 'user_id', 'email'),
+        Index('ix_contacts_user_id_change_seq', 'user_id', 'change_seq'),
+    )
+
 
-    user = relationship('User', backref="contacts")
+# SQLite has no trigram indexes, contact search there is backed by an FTS5 table with the trigram tokenizer
+CONTACTS_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+        first_name, second_name, email, content='contacts', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS contacts_fts_insert AFTER INSERT ON contacts BEGIN
+        INSERT INTO contacts_fts(rowid, first_name, second_name, email)
+        VALUES (new.id, new.first_name, new.second_name, new.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS contacts_fts_delete AFTER DELETE ON contacts BEGIN
+        INSERT INTO contacts_fts(contacts_fts, rowid, first_name, second_name, email)
+        VALUES ('delete', old.id, old.first_name, old.second_name, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS contacts_fts_update AFTER UPDATE ON contacts BEGIN
+        INSERT INTO contacts_fts(contacts_fts, rowid, first_name, second_name, email)
+        VALUES ('delete', old.id, old.first_name, old.second_name, old.email);
+        INSERT INTO contacts_fts(rowid, first_name, second_name, email)
+        VALUES (new.id, new.first_name, new.second_name, new.email);
+    END""",
+    "INSERT INTO contacts_fts(contacts_fts) VALUES ('rebuild')",
+]
+
+for statement in CONTACTS_FTS_DDL:
+    event.listen(Contact.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Contact.__table__, "before_drop", DDL("DROP TABLE IF EXISTS contacts_fts").execute_if(dialect="sqlite"))
 
 
 class User(Base):
@@ -31,3 +86,36 @@ class User(Base):
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
     avatar = Column(String(255), nullable=True)
+    # last value of the change sequence of the user's contacts
+    contacts_seq = Column(Integer, nullable=False, default=0)
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    id = Column(Integer, primary_key=True)
+    recipient = Column(String(250), nullable=False)
+    subject = Column(String(255), nullable=False)
+    template_name = Column(String(100), nullable=False)
+    template_body = Column(Text, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    failed = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_email_outbox_failed_next_attempt_at', 'failed', 'next_attempt_at'),
+    )
+
+
+class ContactTombstone(Base):
+    __tablename__ = "contact_tombstones"
+    id = Column(Integer, primary_key=True)
+    contact_id = Column(Integer, nullable=False)
+    user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    change_seq = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_contact_tombstones_user_id_change_seq', 'user_id', 'change_seq'),
+    )
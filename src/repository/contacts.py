@@ -1,40 +1,125 @@
-from datetime import datetime
+from datetime import date, timedelta
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, delete, bindparam, or_, case, func, literal_column, table, column
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.models import Contact, User
-from src.schemas import ContactModel
+from src.database.models import Contact, ContactTombstone, User, birthday_doy
+from src.schemas import ContactModel, ContactOperation
+from src.services.cache import invalidate_contacts
 
+CONTACT_FIELDS = ("first_name", "second_name", "email", "phone_number", "birthday", "additional_info")
+BATCH_UPDATE_FIELDS = CONTACT_FIELDS + ("birthday_doy", "change_seq")
+EXPORT_FIELDS = ("id", "first_name", "second_name", "email", "phone_number", "birthday", "additional_info")
+UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
 
-async def get_contacts(user: User, db: Session):
+
+def contact_values(body: ContactModel, user: User) -> dict:
+    """
+    The contact_values function maps a ContactModel to the column values of a new contact of the user.
+
+    :param body: ContactModel: The contact data
+    :param user: User: The owner of the contact
+    :return: A dictionary of column values
+    """
+    return {
+        "first_name": body.first_name,
+        "second_name": body.second_name,
+        "email": body.email,
+        "phone_number": body.phone_number,
+        "birthday": body.birthday,
+        "additional_info": body.additional_info,
+        "user_id": user.id,
+    }
+
+
+async def next_change_seq(user: User, db: AsyncSession, count: int = 1) -> int:
+    """
+    The next_change_seq function reserves count consecutive values of the user's change sequence.
+    The counter is incremented in the user's row, which stays locked until the transaction ends,
+    so the changes of one user are committed in the order of their sequence values and a client
+    that synced up to some value can never miss a change committed later with a smaller one.
+
+    :param user: User: The owner of the changed contacts
+    :param db: AsyncSession: Pass the database session to the function
+    :param count: int: Number of values to reserve
+    :return: The first reserved value
+    """
+    result = await db.execute(update(User).where(User.id == user.id)
+                              .values(contacts_seq=User.contacts_seq + count).returning(User.contacts_seq))
+    return result.scalar_one() - count + 1
+
+
+async def get_contacts(user: User, db: AsyncSession, limit: int | None = None, after_id: int | None = None):
     """
-    The get_contacts function returns a list of contacts for the user.
+    The get_contacts function returns a list of contacts for the user ordered by id.
+    With limit and after_id it returns one page using the (user_id, id) index,
+    so the cost of a page does not depend on the size of the address book.
 
     :param user: User: Get the user_id from the database
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
+    :param limit: int | None: Maximum number of contacts to return
+    :param after_id: int | None: Return only contacts with a greater id
     :return: A list of contacts for a given user
     :doc-author: Trelent
     """
-    contacts = db.query(Contact).filter_by(user_id=user.id).all()
-    return contacts
+    query = select(Contact).filter_by(user_id=user.id).order_by(Contact.id)
+    if after_id is not None:
+        query = query.filter(Contact.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    contacts = await db.execute(query)
+    return contacts.scalars().all()
+
+
+async def stream_contacts(user: User, db: AsyncSession, batch_size: int = 1000):
+    """
+    The stream_contacts function yields every contact of the user as a plain row.
+    Rows are fetched through a server-side cursor batch_size at a time and are not
+    added to the session, so memory does not grow with the size of the address book.
 
+    :param user: User: Get the user_id from the database
+    :param db: AsyncSession: Pass the database session to the function
+    :param batch_size: int: Number of rows fetched from the database at once
+    :return: An async iterator of rows with the EXPORT_FIELDS columns
+    """
+    query = select(*(getattr(Contact, field) for field in EXPORT_FIELDS)) \
+        .filter_by(user_id=user.id).order_by(Contact.id).execution_options(yield_per=batch_size)
+    rows = await db.stream(query)
+    async for row in rows:
+        yield row
 
-async def get_contact(user, contact_id, db: Session):
+
+async def get_contact(user, contact_id, db: AsyncSession):
     """
     The get_contact function takes in a user and contact_id, and returns the contact with that id.
 
 
     :param user: Filter the contacts by user
     :param contact_id: Find the contact in the database
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: A contact from the database
     :doc-author: Trelent
     """
-    contact = db.query(Contact).filter_by(id=contact_id, user_id=user.id).first()
-    return contact
+    contact = await db.execute(select(Contact).filter_by(id=contact_id, user_id=user.id))
+    return contact.scalars().first()
+
+
+async def get_contacts_version(user: User, db: AsyncSession) -> int:
+    """
+    The get_contacts_version function returns the version of the user's contacts, the latest value
+    of the user's change sequence. Every create, update and delete takes the next value, so the version
+    grows whenever the contacts change, whatever the clocks of the workers say.
+    The user is read again because the current user may come from the user cache.
 
+    :param user: User: Get the user_id from the database
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The version of the contacts
+    """
+    return await db.scalar(select(User.contacts_seq).where(User.id == user.id))
 
-async def create_contact(body: ContactModel, user: User, db: Session):
+
+async def create_contact(body: ContactModel, user: User, db: AsyncSession):
     """
     The create_contact function creates a new contact in the database.
         Args:
@@ -43,26 +128,73 @@ async def create_contact(body: ContactModel, user: User, db: Session):
 
     :param body: ContactModel: Pass the data from the request body to the function
     :param user: User: Get the user id of the current logged in user
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: A contact object
     :doc-author: Trelent
     """
-    contact = Contact(
-        first_name=body.first_name,
-        second_name=body.second_name,
-        email=body.email,
-        phone_number=body.phone_number,
-        birthday=body.birthday,
-        additional_info=body.additional_info,
-        user_id=user.id
-    )
+    contact = Contact(**contact_values(body, user), change_seq=await next_change_seq(user, db))
     db.add(contact)
-    db.commit()
-    db.refresh(contact)
+    await db.commit()
+    await invalidate_contacts(user.id)
     return contact
 
 
-async def patch_contact(body: ContactModel, user: User, contact_id: int, db: Session):
+async def import_contacts(rows: list[tuple[int, ContactModel]], user: User, db: AsyncSession) -> list[dict]:
+    """
+    The import_contacts function inserts a batch of contacts with one multi-row INSERT and commits it.
+        Rows whose email or phone number is already taken, in the database or earlier in the batch,
+        are skipped and reported instead of aborting the whole batch.
+        On PostgreSQL and SQLite the insert uses ON CONFLICT DO NOTHING, so rows taken by a
+        concurrent request between the check and the insert are reported as well.
+
+    :param rows: list[tuple[int, ContactModel]]: Pairs of the row number in the source file and the contact
+    :param user: User: The owner of the new contacts
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A list of errors with the row number and the reason
+    """
+    emails = [body.email for _, body in rows]
+    phones = [body.phone_number for _, body in rows]
+    taken = await db.execute(select(Contact.email, Contact.phone_number)
+                             .filter(or_(Contact.email.in_(emails), Contact.phone_number.in_(phones))))
+    taken_emails, taken_phones = set(), set()
+    for email, phone_number in taken:
+        taken_emails.add(email)
+        taken_phones.add(phone_number)
+
+    errors, values = [], []
+    for row, body in rows:
+        if body.email in taken_emails:
+            errors.append({"row": row, "error": f"Email {body.email} already exists"})
+        elif body.phone_number in taken_phones:
+            errors.append({"row": row, "error": f"Phone number {body.phone_number} already exists"})
+        else:
+            taken_emails.add(body.email)
+            taken_phones.add(body.phone_number)
+            values.append((row, contact_values(body, user)))
+    if not values:
+        return errors
+
+    seq = await next_change_seq(user, db, len(values))
+    for offset, (_, value) in enumerate(values):
+        value["change_seq"] = seq + offset
+
+    upsert = UPSERT_DIALECTS.get(db.get_bind().dialect.name)
+    if upsert is None:
+        await db.execute(insert(Contact), [value for _, value in values])
+    else:
+        inserted = await db.execute(upsert(Contact).on_conflict_do_nothing().returning(Contact.email),
+                                    [value for _, value in values])
+        inserted = set(inserted.scalars())
+        errors.extend({"row": row, "error": f"Email {value['email']} or phone number "
+                                            f"{value['phone_number']} already exists"}
+                      for row, value in values if value["email"] not in inserted)
+    await db.commit()
+    await invalidate_contacts(user.id)
+    errors.sort(key=lambda error: error["row"])
+    return errors
+
+
+async def patch_contact(body: ContactModel, user: User, contact_id: int, db: AsyncSession):
     """
     The patch_contact function takes in a ContactModel, User, int and Session.
     It then queries the database for a contact with the given id and user_id.
@@ -72,88 +204,249 @@ async def patch_contact(body: ContactModel, user: User, contact_id: int, db: Ses
     :param body: ContactModel: Get the contact information from the request body
     :param user: User: Check if the user is logged in
     :param contact_id: int: Find the contact in the database
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :return: The contact object
     :doc-author: Trelent
     """
-    contact = db.query(Contact).filter_by(id=contact_id, user_id=user.id).first()
+    contact = await get_contact(user, contact_id, db)
     if contact:
         contact.first_name = body.first_name
-        contact.last_name = body.second_name
+        contact.second_name = body.second_name
         contact.email = body.email
         contact.phone_number = body.phone_number
         contact.birthday = body.birthday
+        contact.birthday_doy = birthday_doy(body.birthday)
         contact.additional_info = body.additional_info
-        db.commit()
+        contact.change_seq = await next_change_seq(user, db)
+        await db.commit()
+        await invalidate_contacts(user.id)
     return contact
 
 
-async def delete_contact(contact_id: int, user: User, db: Session):
+async def delete_contact(contact_id: int, user: User, db: AsyncSession):
     """
-    The delete_contact function deletes a contact from the database.
+    The delete_contact function deletes a contact from the database and leaves a tombstone
+    with the next value of the change sequence in its place, so get_contact_changes reports the delete.
         Args:
             contact_id (int): The id of the contact to delete.
             user (User): The user who is deleting the contact. This is used for authorization purposes, so that only contacts belonging to this user can be deleted by them.
-            db (Session): A connection to our database, which we use in order to query and update it with new data.
+            db (AsyncSession): A connection to our database, which we use in order to query and update it with new data.
 
     :param contact_id: int: Get the contact with that id from the database
     :param user: User: Get the user_id from the database
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :return: A contact object
     :doc-author: Trelent
     """
-    contact = db.query(Contact).filter_by(id=contact_id, user_id=user.id).first()
+    contact = await get_contact(user, contact_id, db)
     if contact:
-        db.delete(contact)
-        db.commit()
+        await db.delete(contact)
+        db.add(ContactTombstone(contact_id=contact.id, user_id=user.id, change_seq=await next_change_seq(user, db)))
+        await db.commit()
+        await invalidate_contacts(user.id)
     return contact
 
 
-async def get_contact_by_query(user: User, contact_first_name, contact_second_name, contact_email, db):
+async def batch_contacts(operations: list[ContactOperation], user: User, db: AsyncSession) -> list[dict]:
+    """
+    The batch_contacts function applies a list of update and delete operations to the user's contacts
+    in one transaction and returns the status of every operation in the order of the list.
+        All deletes run as one DELETE ... WHERE id IN and all updates as one executemany UPDATE,
+        so the number of statements does not depend on the number of operations.
+        An operation fails with 404 when the contact does not belong to the user, and with 409 when
+        it repeats an id of an earlier operation or sets an email or phone number held by another
+        contact that is not deleted in the same batch. Failed operations do not stop the others.
+
+    :param operations: list[ContactOperation]: The operations to apply
+    :param user: User: The owner of the contacts
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A list with the id, operation, status code and error detail of every operation
+    """
+    ids = {operation.id for operation in operations}
+    owned = set((await db.execute(select(Contact.id).where(Contact.user_id == user.id, Contact.id.in_(ids))))
+                .scalars())
+    deleted_ids = {operation.id for operation in operations if operation.op == "delete" and operation.id in owned}
+    updates = [operation.contact for operation in operations if operation.op == "update"]
+    taken_emails, taken_phones = {}, {}
+    if updates:
+        taken = await db.execute(select(Contact.id, Contact.email, Contact.phone_number)
+                                 .filter(or_(Contact.email.in_([body.email for body in updates]),
+                                             Contact.phone_number.in_([body.phone_number for body in updates]))))
+        for contact_id, email, phone_number in taken:
+            if contact_id not in deleted_ids:
+                taken_emails[email] = contact_id
+                taken_phones[phone_number] = contact_id
+
+    results, seen, to_update, to_delete = [], set(), [], []
+    for operation in operations:
+        result = {"id": operation.id, "op": operation.op, "status": 200, "detail": None}
+        results.append(result)
+        if operation.id not in owned:
+            result.update(status=404, detail="Not found")
+        elif operation.id in seen:
+            result.update(status=409, detail="Duplicate operation on the contact")
+        elif operation.op == "delete":
+            result["status"] = 204
+            to_delete.append(operation.id)
+        elif taken_emails.get(operation.contact.email, operation.id) != operation.id:
+            result.update(status=409, detail=f"Email {operation.contact.email} already exists")
+        elif taken_phones.get(operation.contact.phone_number, operation.id) != operation.id:
+            result.update(status=409, detail=f"Phone number {operation.contact.phone_number} already exists")
+        else:
+            taken_emails[operation.contact.email] = operation.id
+            taken_phones[operation.contact.phone_number] = operation.id
+            to_update.append(operation)
+        seen.add(operation.id)
+    if not to_update and not to_delete:
+        return results
+
+    seq = await next_change_seq(user, db, len(to_update) + len(to_delete))
+    if to_delete:
+        await db.execute(delete(Contact.__table__)
+                         .where(Contact.user_id == user.id, Contact.id.in_(to_delete)))
+        await db.execute(insert(ContactTombstone), [
+            {"contact_id": contact_id, "user_id": user.id, "change_seq": seq + offset}
+            for offset, contact_id in enumerate(to_delete)
+        ])
+        seq += len(to_delete)
+    if to_update:
+        # bind names must differ from the names of the updated columns
+        statement = update(Contact.__table__) \
+            .where(Contact.id == bindparam("b_id"), Contact.user_id == user.id) \
+            .values({field: bindparam(f"b_{field}") for field in BATCH_UPDATE_FIELDS})
+        params = []
+        for offset, operation in enumerate(to_update):
+            body = operation.contact
+            values = {f"b_{field}": getattr(body, field) for field in CONTACT_FIELDS}
+            params.append({"b_id": operation.id, **values, "b_birthday_doy": birthday_doy(body.birthday),
+                           "b_change_seq": seq + offset})
+        await db.execute(statement, params)
+    await db.commit()
+    await invalidate_contacts(user.id)
+    return results
+
+
+async def get_contact_changes(user: User, db: AsyncSession, since: int = 0,
+                              limit: int = 100) -> tuple[list[Contact], list[int], int, bool]:
+    """
+    The get_contact_changes function returns the contacts created or updated and the ids of the contacts
+    deleted after the position since of the user's change sequence, oldest change first.
+    Both tables are read through their (user_id, change_seq) index, so the cost depends on
+    the number of changes and not on the size of the address book.
+
+    :param user: User: Get the user_id from the database
+    :param db: AsyncSession: Pass the database session to the function
+    :param since: int: Position of the last change the client has seen
+    :param limit: int: Maximum number of changes to return
+    :return: The changed contacts, the deleted contact ids, the position of the last returned change
+        and whether more changes follow it
+    """
+    contacts = await db.execute(select(Contact).where(Contact.user_id == user.id, Contact.change_seq > since)
+                                .order_by(Contact.change_seq).limit(limit + 1))
+    tombstones = await db.execute(select(ContactTombstone.change_seq, ContactTombstone.contact_id)
+                                  .where(ContactTombstone.user_id == user.id, ContactTombstone.change_seq > since)
+                                  .order_by(ContactTombstone.change_seq).limit(limit + 1))
+    changes = [(contact.change_seq, contact) for contact in contacts.scalars()]
+    changes.extend((change_seq, contact_id) for change_seq, contact_id in tombstones)
+    changes.sort(key=lambda change: change[0])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    updated = [change for _, change in changes if isinstance(change, Contact)]
+    deleted = [change for _, change in changes if not isinstance(change, Contact)]
+    last_seq = changes[-1][0] if changes else since
+    return updated, deleted, last_seq, has_more
+
+
+async def get_contact_by_query(user: User, contact_first_name, contact_second_name, contact_email, db: AsyncSession):
     """
     The get_contact_by_query function is used to query the database for a contact.
         The function takes in four parameters: user, contact_first_name, contact_second_name and db.
-        It then queries the database using these parameters and returns a list of contacts that match the query.
+        It then queries the database using every given parameter and returns a list of contacts that match all of them.
 
     :param user: User: Get the user id from the user object
     :param contact_first_name: Filter the contacts by first name
     :param contact_second_name: Filter the query by second name
     :param contact_email: Filter the contacts by email
-    :param db: Pass the database connection to the function
+    :param db: AsyncSession: Pass the database connection to the function
     :return: A list of contacts that match the search query
     :doc-author: Trelent
     """
-    contact = db.query(Contact).filter_by(user_id=user.id)
+    query = select(Contact).filter_by(user_id=user.id)
     if contact_first_name:
-        contact = contact.filter(Contact.first_name.like(contact_first_name)).all()
-    elif contact_second_name:
-        contact = contact.filter(Contact.second_name.like(contact_second_name)).all()
-    elif contact_email:
-        contact = contact.filter(Contact.email.like(contact_email)).all()
+        query = query.filter(Contact.first_name.like(contact_first_name))
+    if contact_second_name:
+        query = query.filter(Contact.second_name.like(contact_second_name))
+    if contact_email:
+        query = query.filter(Contact.email.like(contact_email))
+
+    contact = await db.execute(query)
+    return contact.scalars().all()
+
+
+SEARCH_FIELDS = (Contact.first_name, Contact.second_name, Contact.email)
+contacts_fts = table("contacts_fts", column("rowid"))
 
-    return contact
 
+def _contains(q: str):
+    pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return or_(*(field.ilike(pattern, escape="\\") for field in SEARCH_FIELDS))
 
-async def get_nearest_birthday(user: User, db):
+
+async def search_contacts(user: User, q: str, db: AsyncSession, limit: int = 20, offset: int = 0):
     """
-    The get_nearest_birthday function takes a user and a database connection as arguments.
-    It then queries the database for all contacts associated with that user, and returns
-    a list of contacts whose birthday is within 7 days from today.
+    The search_contacts function finds the contacts of the user whose first name, second name
+    or email contains q, ignoring case, best matches first.
+        On PostgreSQL the filter uses the pg_trgm GIN indexes and the results are ranked by trigram similarity.
+        On SQLite it uses the contacts_fts FTS5 table and the results are ranked by bm25.
+        Queries shorter than three characters can not use trigrams and fall back to a plain scan.
 
     :param user: User: Get the user id from the user object
-    :param db: Pass the database connection to the function
-    :return: A list of contacts whose birthday is within 7 days
-    :doc-author: Trelent
+    :param q: str: The text to search for
+    :param db: AsyncSession: Pass the database connection to the function
+    :param limit: int: Maximum number of contacts to return
+    :param offset: int: Number of best matches to skip
+    :return: A list of matching contacts
     """
-    date_now = datetime.now().date()
-    birthday_7_days = []
-    contacts = db.query(Contact).filter_by(user_id=user.id).all()
+    query = select(Contact).filter_by(user_id=user.id)
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite" and len(q) >= 3:
+        fts = literal_column("contacts_fts")
+        query = query.join(contacts_fts, contacts_fts.c.rowid == Contact.id) \
+            .filter(fts.op("MATCH")('"' + q.replace('"', '""') + '"')) \
+            .order_by(func.bm25(fts), Contact.id)
+    elif dialect == "postgresql":
+        query = query.filter(_contains(q)) \
+            .order_by(func.greatest(*(func.similarity(field, q) for field in SEARCH_FIELDS)).desc(), Contact.id)
+    else:
+        query = query.filter(_contains(q)).order_by(Contact.id)
+    contacts = await db.execute(query.limit(limit).offset(offset))
+    return contacts.scalars().all()
 
-    for contact in contacts:
-        contact_birthday = contact.birthday
-        this_year_contact_birthday = datetime(date_now.year, contact_birthday.month, contact_birthday.day).date()
-        days_left = this_year_contact_birthday - date_now
-        if 0 <= days_left.days <= 7:
-            birthday_7_days.append(contact)
 
-    return birthday_7_days
+async def get_nearest_birthday(user: User, db: AsyncSession, days: int = 7, today: date | None = None):
+    """
+    The get_nearest_birthday function returns the contacts of the user whose birthday is
+    within the given number of days from today, today included, ordered by the upcoming birthday.
+    It is a single range query on the (user_id, birthday_doy) index. Windows that cross
+    New Year are split into two ranges, and February 29 birthdays are found in every year.
+
+    :param user: User: Get the user id from the user object
+    :param db: AsyncSession: Pass the database connection to the function
+    :param days: int: Size of the window in days
+    :param today: date | None: First day of the window, the current date by default
+    :return: A list of contacts whose birthday is within the window
+    :doc-author: Trelent
+    """
+    today = today or date.today()
+    start = birthday_doy(today)
+    end = birthday_doy(today + timedelta(days=days))
+    query = select(Contact).filter_by(user_id=user.id)
+    if days < 365:
+        if start <= end:
+            query = query.filter(Contact.birthday_doy.between(start, end))
+        else:
+            query = query.filter(or_(Contact.birthday_doy >= start, Contact.birthday_doy <= end))
+    query = query.order_by(case((Contact.birthday_doy >= start, Contact.birthday_doy - start),
+                                else_=Contact.birthday_doy + 366 - start), Contact.id)
+    contacts = await db.execute(query)
+    return contacts.scalars().all()
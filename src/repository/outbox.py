@@ -0,0 +1,88 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import EmailOutbox
+
+
+async def enqueue_email(recipient: str, subject: str, template_name: str, template_body: dict,
+                        db: AsyncSession) -> EmailOutbox:
+    """
+    The enqueue_email function stores an email in the outbox, the outbox worker sends it later.
+
+    :param recipient: str: The email address of the recipient
+    :param subject: str: The subject of the email
+    :param template_name: str: The template the body is rendered from
+    :param template_body: dict: The variables of the template
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The queued email
+    """
+    email = EmailOutbox(recipient=recipient, subject=subject, template_name=template_name,
+                        template_body=json.dumps(template_body))
+    db.add(email)
+    await db.commit()
+    return email
+
+
+async def claim_emails(db: AsyncSession, limit: int, now: datetime | None = None) -> list[EmailOutbox]:
+    """
+    The claim_emails function returns the oldest emails that are due to be sent.
+    On PostgreSQL the rows stay locked until the transaction ends and rows locked by
+    another worker are skipped, so several workers can drain the same outbox.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :param limit: int: Maximum number of emails to return
+    :param now: datetime | None: The current time, utcnow by default
+    :return: A list of emails
+    """
+    now = now or datetime.utcnow()
+    emails = await db.execute(select(EmailOutbox)
+                              .where(EmailOutbox.failed.is_(False), EmailOutbox.next_attempt_at <= now)
+                              .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(limit)
+                              .with_for_update(skip_locked=True))
+    return emails.scalars().all()
+
+
+async def delete_emails(ids: list[int], db: AsyncSession) -> None:
+    """
+    The delete_emails function removes sent emails from the outbox with one DELETE ... WHERE id IN.
+
+    :param ids: list[int]: The ids of the sent emails
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    """
+    if ids:
+        await db.execute(delete(EmailOutbox).where(EmailOutbox.id.in_(ids)))
+
+
+async def retry_email(email: EmailOutbox, error: str, retry_at: datetime | None, db: AsyncSession) -> None:
+    """
+    The retry_email function records a failed attempt to send an email.
+    With retry_at None the email is marked as failed and is not sent again.
+
+    :param email: EmailOutbox: The email that could not be sent
+    :param error: str: The reason of the failure
+    :param retry_at: datetime | None: When to try again
+    :param db: AsyncSession: Pass the database session to the function
+    :return: None
+    """
+    values = {"attempts": EmailOutbox.attempts + 1, "last_error": error}
+    if retry_at is None:
+        values["failed"] = True
+    else:
+        values["next_attempt_at"] = retry_at
+    await db.execute(update(EmailOutbox).where(EmailOutbox.id == email.id).values(**values))
+
+
+async def outbox_depth(db: AsyncSession) -> dict:
+    """
+    The outbox_depth function counts the emails waiting in the outbox and the emails that gave up.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A dictionary with the number of pending and failed emails
+    """
+    rows = await db.execute(select(EmailOutbox.failed, func.count()).group_by(EmailOutbox.failed))
+    counts = dict(rows.all())
+    return {"pending": counts.get(False, 0), "failed": counts.get(True, 0)}
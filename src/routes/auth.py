@@ -1,8 +1,9 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Security, Request
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.connect import get_db
 from src.database.models import User
@@ -10,54 +11,60 @@ from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail
 from src.repository import users as repository_users
 from src.services.auth import auth_service
 from src.services.email import send_email
+from src.services.metrics import InstrumentedRoute
+from src.services.ratelimit import ClientRateLimit
+from src.services.revocation import revocation_list
 
-router = APIRouter(prefix='/auth', tags=["auth"])
+router = APIRouter(prefix='/auth', tags=["auth"], route_class=InstrumentedRoute)
 security = HTTPBearer()
+signup_limit = ClientRateLimit("auth_signup")
+login_limit = ClientRateLimit("auth_login")
+request_email_limit = ClientRateLimit("auth_request_email")
 
 
-@router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup(body: UserModel, background_tasks: BackgroundTasks, request: Request, db: Session = Depends(get_db)):
+@router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(signup_limit)])
+async def signup(body: UserModel, request: Request, db: AsyncSession = Depends(get_db)):
     """
     The signup function creates a new user in the database.
         It takes in a UserModel object, which is validated by pydantic.
         The password is hashed using the auth_service module and then stored as an encrypted string.
-        A background task is added to send an email to the user's email address with their username.
+        An email with a confirmation link is queued in the outbox for the user's email address.
 
     :param body: UserModel: Get the user's username and password
-    :param background_tasks: BackgroundTasks: Add a task to the background tasks queue
     :param request: Request: Get the base url of the application
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :return: A dictionary with two keys: user and detail
     :doc-author: Trelent
     """
     exist_user = await repository_users.get_user_by_username(body.username, db)
-    exist_email = db.query(User).filter(User.username == body.email).first()
+    exist_email = await repository_users.get_user_by_email(body.email, db)
     if exist_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Account already exists")
     if exist_email:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already in use")
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash_async(body.password)
     new_user = await repository_users.create_user(body, db)
-    background_tasks.add_task(send_email, new_user.email, new_user.username, request.base_url)
+    await send_email(new_user.email, new_user.username, request.base_url, db)
     return {"user": new_user, "detail": "User successfully created"}
 
 
-@router.post("/login", response_model=TokenModel)
-async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+@router.post("/login", response_model=TokenModel, dependencies=[Depends(login_limit)])
+async def login(body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
     The login function is used to authenticate a user.
         It takes in the username and password of the user, and returns an access token if successful.
         The access token can be used to make authenticated requests.
 
     :param body: OAuth2PasswordRequestForm: Get the username and password from the request body
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A jwt token
     :doc-author: Trelent
     """
     user = await repository_users.get_user_by_username(body.username, db)
     if user is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid username")
-    if not auth_service.verify_password(body.password, user.password):
+    if not await auth_service.verify_password_async(body.password, user.password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid password")
     if not user.confirmed:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
@@ -69,14 +76,14 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
 
 
 @router.get('/refresh_token', response_model=TokenModel)
-async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(security), db: AsyncSession = Depends(get_db)):
     """
     The refresh_token function is used to refresh the access token.
         The function takes in a refresh token and returns a new access_token,
         refresh_token, and the type of bearer.
 
     :param credentials: HTTPAuthorizationCredentials: Get the token from the request header
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A dict with the access_token, refresh_token and token_type
     :doc-author: Trelent
     """
@@ -93,8 +100,31 @@ async def refresh_token(credentials: HTTPAuthorizationCredentials = Security(sec
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
+@router.post('/logout', status_code=status.HTTP_204_NO_CONTENT)
+async def logout(token: str = Depends(auth_service.oauth2_scheme),
+                 current_user: User = Depends(auth_service.get_current_user),
+                 db: AsyncSession = Depends(get_db)):
+    """
+    The logout function revokes the access token of the request until it expires
+    and discards the refresh token of the user.
+
+    :param token: str: The access token of the request
+    :param current_user: User: The user the token belongs to
+    :param db: AsyncSession: Get the database session
+    :return: None
+    """
+    claims = auth_service.tokens.decode(token)
+    if "jti" in claims:
+        try:
+            await revocation_list.revoke(claims["jti"], claims["exp"])
+        except RedisError:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Could not revoke the token")
+    user = await repository_users.get_user_by_username(current_user.username, db)
+    await repository_users.update_token(user, None, db)
+
+
 @router.get('/confirmed_email/{token}')
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
     The confirmed_email function is used to confirm a user's email address.
         It takes the token from the URL and uses it to get the user's email address.
@@ -104,7 +134,7 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
             confirmed_email function which sets the 'confirmed' field of that particular record to
 
     :param token: str: Get the token from the url
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A message if the email is already confirmed
     :doc-author: Trelent
     """
@@ -114,13 +144,12 @@ async def confirmed_email(token: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Verification error")
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
-    await repository_users.confirmed_email(email, db)
+    await repository_users.confirmed_email(user, db)
     return {"message": "Email confirmed"}
 
 
-@router.post('/request_email')
-async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, request: Request,
-                        db: Session = Depends(get_db)):
+@router.post('/request_email', dependencies=[Depends(request_email_limit)])
+async def request_email(body: RequestEmail, request: Request, db: AsyncSession = Depends(get_db)):
     """
     The request_email function is used to send an email to the user with a link that they can click on
     to confirm their email address. The function takes in a RequestEmail object, which contains the
@@ -129,9 +158,8 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     an email containing a confirmation link.
 
     :param body: RequestEmail: Get the email from the request body
-    :param background_tasks: BackgroundTasks: Add a task to the background tasks queue
     :param request: Request: Get the base url of the application
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A message that is displayed on the page
     :doc-author: Trelent
     """
@@ -140,5 +168,5 @@ async def request_email(body: RequestEmail, background_tasks: BackgroundTasks, r
     if user.confirmed:
         return {"message": "Your email is already confirmed"}
     if user:
-        background_tasks.add_task(send_email, user.email, user.username, request.base_url)
+        await send_email(user.email, user.username, request.base_url, db)
     return {"message": "Check your email for confirmation."}
\ No newline at end of file
@@ -1,107 +1,235 @@
-from datetime import datetime
+import codecs
+import csv
+from datetime import date
 from typing import List
 
-from fastapi import Path, Depends, HTTPException, status, APIRouter
-from fastapi_limiter.depends import RateLimiter
-
-from sqlalchemy.orm import Session
+from fastapi import Path, Query, Header, Depends, HTTPException, status, APIRouter, UploadFile, File, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.connect import get_db
 from src.database.models import User
-from src.schemas import ContactModel, RespondsContact
+from src.schemas import (ContactModel, RespondsContact, ContactPage, ContactChanges, ContactImportResult, ContactBatch,
+                         ContactOperationResult)
 from src.repository import contacts as contact_repository
 from src.services.auth import auth_service
+from src.services.pagination import encode_cursor, decode_cursor
+from src.services.export import ndjson_lines, csv_lines
+from src.services.cache import cached_contacts
+from src.services.etag import make_etag, etag_matches, not_modified
+from src.services.metrics import InstrumentedRoute
+from src.services.ratelimit import UserRateLimit
+from src.conf.config import settings
+
+router = APIRouter(prefix="/contacts", tags=["contacts"], route_class=InstrumentedRoute)
+create_limit = UserRateLimit("contacts_create")
+import_limit = UserRateLimit("contacts_import")
+batch_limit = UserRateLimit("contacts_batch")
 
-router = APIRouter(prefix="/contacts", tags=["contacts"])
 
+def serialize_contacts(contacts) -> list[dict]:
+    return [RespondsContact.from_orm(contact).dict() for contact in contacts]
 
-@router.get("/", response_model=List[RespondsContact])
-async def get_contacts(db: Session = Depends(get_db), current_user: User = Depends(auth_service.get_current_user)):
+
+async def get_contacts_etag(current_user: User, db: AsyncSession) -> str:
     """
-    The get_contacts function returns a list of contacts for the current user.
+    The get_contacts_etag function returns the ETag of the current user's contacts.
+        It is computed before the contacts are read, so a change made in between can only make
+        the ETag older than the body and the next conditional request downloads the contacts again.
 
-    :param db: Session: Pass the database session to the repository
     :param current_user: User: Get the current user
-    :return: A list of contacts
-    :doc-author: Trelent
+    :param db: AsyncSession: Pass the database session to the repository
+    :return: A weak ETag
+    """
+    async def load():
+        return make_etag(await contact_repository.get_contacts_version(current_user, db))
+
+    return await cached_contacts(current_user.id, "etag", {}, load)
+
+
+@router.get("/", response_model=ContactPage)
+async def get_contacts(response: Response, limit: int = Query(50, ge=1, le=500), cursor: str = None,
+                       if_none_match: str = Header(None), db: AsyncSession = Depends(get_db),
+                       current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The get_contacts function returns one page of contacts for the current user.
+        Pages are ordered by id. Pass the next_cursor of a page as cursor to get the following page,
+        next_cursor is null on the last page.
+        The response has an ETag, a request with a matching If-None-Match gets 304 Not Modified
+        without the contacts being read.
+
+    :param response: Response: Set the ETag header
+    :param limit: int: Maximum number of contacts in the page
+    :param cursor: str: The next_cursor of the previous page
+    :param if_none_match: str: The ETag of the page the client already has
+    :param db: AsyncSession: Pass the database session to the repository
+    :param current_user: User: Get the current user
+    :return: A page of contacts and the cursor of the next page
+    """
+    after_id = decode_cursor(cursor) if cursor else None
+    etag = await get_contacts_etag(current_user, db)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    async def load():
+        contacts = await contact_repository.get_contacts(current_user, db, limit=limit + 1, after_id=after_id)
+        next_cursor = encode_cursor(contacts[limit - 1].id) if len(contacts) > limit else None
+        return {"items": serialize_contacts(contacts[:limit]), "next_cursor": next_cursor}
+
+    return await cached_contacts(current_user.id, "list", {"limit": limit, "after_id": after_id or 0}, load)
+
+
+EXPORT_FORMATS = {
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+    "csv": (csv_lines, "text/csv"),
+}
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_contacts(export_format: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+                          db: AsyncSession = Depends(get_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The export_contacts function streams every contact of the current user as ndjson or csv.
+        Rows are read from the database in batches while the response is being sent,
+        so the whole address book is never held in memory.
+
+    :param export_format: str: Output format, ndjson or csv
+    :param db: AsyncSession: Pass the database session to the repository
+    :param current_user: User: Get the current user
+    :return: A streaming response with the contacts
+    """
+    encode, media_type = EXPORT_FORMATS[export_format]
+    rows = contact_repository.stream_contacts(current_user, db)
+    return StreamingResponse(encode(rows, contact_repository.EXPORT_FIELDS), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=contacts.{export_format}"})
+
+
+@router.get("/changes", response_model=ContactChanges)
+async def get_contact_changes(since: str = None, limit: int = Query(100, ge=1, le=1000),
+                              db: AsyncSession = Depends(get_db),
+                              current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The get_contact_changes function returns the changes of the current user's contacts since a cursor.
+        items are the contacts created or updated and deleted the ids of the contacts deleted after since,
+        apply the deletes first. Pass next_cursor as since on the next sync; while has_more is true
+        there are more changes to fetch right away. Without since the changes are returned from the beginning.
+
+    :param since: str: The next_cursor of the previous sync
+    :param limit: int: Maximum number of changes in the response
+    :param db: AsyncSession: Pass the database session to the repository
+    :param current_user: User: Get the current user
+    :return: The changed contacts, the deleted ids and the cursor of the next sync
     """
-    contacts = await contact_repository.get_contacts(current_user, db)
-    return contacts
+    since = decode_cursor(since) if since else 0
+    contacts, deleted, last_seq, has_more = await contact_repository.get_contact_changes(current_user, db, since,
+                                                                                         limit)
+    return {"items": contacts, "deleted": deleted, "next_cursor": encode_cursor(last_seq), "has_more": has_more}
 
 
 @router.get("/{contact_id}", response_model=RespondsContact)
-async def find_contact(contact_id: int = Path(1, ge=1), db: Session = Depends(get_db),
+async def find_contact(response: Response, contact_id: int = Path(1, ge=1), if_none_match: str = Header(None),
+                       db: AsyncSession = Depends(get_db),
                        current_user: User = Depends(auth_service.get_current_user)):
     """
     The find_contact function is used to find a contact by its id.
+        The response has an ETag, a request with a matching If-None-Match gets 304 Not Modified
+        without the contact being read.
 
+    :param response: Response: Set the ETag header
     :param contact_id: int: Get the contact id from the url
     :param ge: Set a minimum value for the contact_id parameter
-    :param db: Session: Pass the database session to the repository
+    :param if_none_match: str: The ETag of the contact the client already has
+    :param db: AsyncSession: Pass the database session to the repository
     :param current_user: User: Get the current user
     :return: A contact object
     :doc-author: Trelent
     """
-    contact = await contact_repository.get_contact(current_user, contact_id, db)
+    etag = await get_contacts_etag(current_user, db)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    async def load():
+        contact = await contact_repository.get_contact(current_user, contact_id, db)
+        return RespondsContact.from_orm(contact).dict() if contact else None
+
+    contact = await cached_contacts(current_user.id, "contact", {"id": contact_id}, load)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     return contact
 
 
 @router.get("/find/", response_model=List[RespondsContact])
-async def find_contact_by_query(contact_first_name: str = None, contact_second_name: str = None,
-                                contact_email: str = None, db: Session = Depends(get_db),
+async def find_contact_by_query(q: str = Query(None, min_length=1, max_length=100), contact_first_name: str = None,
+                                contact_second_name: str = None, contact_email: str = None,
+                                limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0),
+                                db: AsyncSession = Depends(get_db),
                                 current_user: User = Depends(auth_service.get_current_user)):
     """
     The find_contact_by_query function is used to find a contact by their first name, second name or email.
         The function takes in the following parameters:
+            - q (str): Text to search for in the first name, second name and email, ignoring case.
+              The results are ranked, best matches first, and paginated with limit and offset.
             - contact_first_name (str): The first name of the user you are searching for.
             - contact_second_name (str): The second name of the user you are searching for.
             - contact_email (str): The email address of the user you are searching for.
 
+    :param q: str: Search across first name, second name and email
     :param contact_first_name: str: Specify the first name of a contact
     :param contact_second_name: str: Specify the second name of a contact
     :param contact_email: str: Search for a contact by email
-    :param db: Session: Pass the database session to the repository
+    :param limit: int: Maximum number of contacts returned for q
+    :param offset: int: Number of contacts skipped for q
+    :param db: AsyncSession: Pass the database session to the repository
     :param current_user: User: Get the current user from the database
     :return: A contact object
     :doc-author: Trelent
     """
+    if q:
+        return await contact_repository.search_contacts(current_user, q, db, limit, offset)
     contact = await contact_repository.get_contact_by_query(current_user, contact_first_name, contact_second_name,
                                                             contact_email, db)
-    print(contact)
     if contact is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
     return contact
 
 
 @router.get("/birthday/", response_model=List[RespondsContact])
-async def get_nearest_birthday(db: Session = Depends(get_db),
+async def get_nearest_birthday(days: int = Query(7, ge=0, le=366), db: AsyncSession = Depends(get_db),
                                current_user: User = Depends(auth_service.get_current_user)):
     """
     The get_nearest_birthday function returns the nearest birthday of a contact.
-        The function takes in two parameters: db and current_user.
-        The db parameter is used to connect to the database, while current_user is used for authentication purposes.
+        The function takes in three parameters: days, db and current_user.
+        The days parameter is the size of the window, the db parameter is used to connect to the database, while current_user is used for authentication purposes.
 
-    :param db: Session: Get the database session
+    :param days: int: Number of days to look ahead, 7 by default
+    :param db: AsyncSession: Get the database session
     :param current_user: User: Get the current user from the database
     :return: A list of contacts with the nearest birthday
     :doc-author: Trelent
     """
-    contacts = await contact_repository.get_nearest_birthday(current_user, db)
-    return contacts
+    today = date.today()
+
+    async def load():
+        contacts = await contact_repository.get_nearest_birthday(current_user, db, days, today)
+        return serialize_contacts(contacts)
+
+    return await cached_contacts(current_user.id, "birthday", {"days": days, "today": today.isoformat()}, load)
 
 
 @router.post("/create", status_code=status.HTTP_201_CREATED, response_model=RespondsContact,
              description='No more than 3 requests per minute',
-             dependencies=[Depends(RateLimiter(times=3, seconds=60))])
-async def create_contact(body: ContactModel, db: Session = Depends(get_db),
+             dependencies=[Depends(create_limit)])
+async def create_contact(body: ContactModel, db: AsyncSession = Depends(get_db),
                          current_user: User = Depends(auth_service.get_current_user)):
     """
     The create_contact function creates a new contact in the database.
 
     :param body: ContactModel: Create a new contact
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :param current_user: User: Get the current user from the database
     :return: A contactmodel object
     :doc-author: Trelent
@@ -110,8 +238,97 @@ async def create_contact(body: ContactModel, db: Session = Depends(get_db),
     return contact
 
 
+IMPORT_FIELDS = ("first_name", "second_name", "email", "phone_number", "birthday")
+
+
+def is_utf8(file, chunk_size: int = 1 << 16) -> bool:
+    """
+    The is_utf8 function reads the whole file through an incremental decoder and rewinds it,
+    so a file that is not utf-8 is rejected before any of its rows is imported.
+
+    :param file: A binary file that can seek
+    :param chunk_size: int: Number of bytes decoded at a time
+    :return: True if the file is valid utf-8
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    try:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return False
+    finally:
+        file.seek(0)
+    return True
+
+
+@router.post("/import", response_model=ContactImportResult, dependencies=[Depends(import_limit)])
+async def import_contacts(file: UploadFile = File(), db: AsyncSession = Depends(get_db),
+                          current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The import_contacts function creates contacts from an uploaded csv file.
+        The file needs a header with at least the columns first_name, second_name, email, phone_number
+        and birthday, so a file made by the csv export can be imported again.
+        Rows are validated with ContactModel and inserted in batches. Invalid rows and rows with an email
+        or phone number that already exists are reported by their line number and do not stop the import.
+        A file that is not utf-8 is rejected as a whole.
+
+    :param file: UploadFile: The csv file
+    :param db: AsyncSession: Pass the database session to the repository
+    :param current_user: User: Get the current user
+    :return: The number of imported contacts and the rows that failed
+    """
+    if not is_utf8(file.file):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The file is not utf-8 encoded")
+    reader = csv.DictReader(codecs.iterdecode(file.file, "utf-8-sig"))
+    missing = [field for field in IMPORT_FIELDS if field not in (reader.fieldnames or ())]
+    if missing:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Missing columns: {', '.join(missing)}")
+    imported, failed, batch = 0, [], []
+    for record in reader:
+        # DictReader puts the values past the last column of the header in a list under the key None
+        if None in record:
+            failed.append({"row": reader.line_num, "error": "More fields than columns in the header"})
+            continue
+        record["additional_info"] = record.get("additional_info") or None
+        try:
+            batch.append((reader.line_num, ContactModel(**record)))
+        except ValidationError as err:
+            failed.append({"row": reader.line_num,
+                           "error": "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in err.errors())})
+        if len(batch) == settings.contacts_import_batch_size:
+            errors = await contact_repository.import_contacts(batch, current_user, db)
+            imported += len(batch) - len(errors)
+            failed.extend(errors)
+            batch = []
+    if batch:
+        errors = await contact_repository.import_contacts(batch, current_user, db)
+        imported += len(batch) - len(errors)
+        failed.extend(errors)
+    failed.sort(key=lambda error: error["row"])
+    return {"imported": imported, "failed": failed}
+
+
+@router.post("/batch", response_model=List[ContactOperationResult], dependencies=[Depends(batch_limit)])
+async def batch_contacts(body: ContactBatch, db: AsyncSession = Depends(get_db),
+                         current_user: User = Depends(auth_service.get_current_user)):
+    """
+    The batch_contacts function updates and deletes many contacts of the current user in one transaction.
+        Every operation gets its own status: 200 for an update, 204 for a delete, 404 when the contact
+        is not found and 409 when the operation conflicts with another contact or an earlier operation.
+        Failed operations do not stop the others.
+
+    :param body: ContactBatch: The list of operations
+    :param db: AsyncSession: Pass the database session to the repository
+    :param current_user: User: Get the current user
+    :return: The status of every operation in the order of the request
+    """
+    return await contact_repository.batch_contacts(body.operations, current_user, db)
+
+
 @router.put("/{contact_id}", response_model=RespondsContact)
-async def update_contact(body: ContactModel, contact_id: int = Path(1, ge=1), db: Session = Depends(get_db),
+async def update_contact(body: ContactModel, contact_id: int = Path(1, ge=1), db: AsyncSession = Depends(get_db),
                          current_user: User = Depends(auth_service.get_current_user)):
     """
     The update_contact function updates a contact in the database.
@@ -121,7 +338,7 @@ async def update_contact(body: ContactModel, contact_id: int = Path(1, ge=1), db
     :param body: ContactModel: Pass in the contact model that will be used to update the contact
     :param contact_id: int: Get the contact_id from the path
     :param ge: Specify the minimum value of the path parameter
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :param current_user: User: Get the user_id of the current user
     :return: The updated contact
     :doc-author: Trelent
@@ -133,7 +350,7 @@ async def update_contact(body: ContactModel, contact_id: int = Path(1, ge=1), db
 
 
 @router.delete("/{contact_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_contact(contact_id: int = Path(1, ge=1), db: Session = Depends(get_db),
+async def delete_contact(contact_id: int = Path(1, ge=1), db: AsyncSession = Depends(get_db),
                          current_user: User = Depends(auth_service.get_current_user)):
     """
     The delete_contact function deletes a contact from the database.
@@ -142,7 +359,7 @@ async def delete_contact(contact_id: int = Path(1, ge=1), db: Session = Depends(
 
     :param contact_id: int: Specify the contact id to be deleted
     :param ge: Specify that the path parameter must be greater than or equal to 1
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :param current_user: User: Get the current user
     :return: A contact object
     :doc-author: Trelent
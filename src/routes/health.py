@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Response, status
+
+from src.services.health import health_checker
+from src.services.metrics import InstrumentedRoute
+
+router = APIRouter(prefix="/health", tags=["health"], include_in_schema=False, route_class=InstrumentedRoute)
+
+
+@router.get("/live")
+async def liveness():
+    """
+    The liveness function answers as long as the worker serves requests. It checks no dependencies,
+    so an outage of the database does not get every worker restarted.
+
+    :return: A dictionary with the status
+    """
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def readiness(response: Response):
+    """
+    The readiness function reports whether the worker can serve traffic, from the results of the
+    background health checker. It does no I/O. The status code is 503 when a required check failed
+    or the results are stale.
+
+    :param response: Response: Set the status code
+    :return: A dictionary with the status and the result of every check
+    """
+    report = health_checker.report()
+    if report["status"] != "ready":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return report
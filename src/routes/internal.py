@@ -0,0 +1,97 @@
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.connect import engine, get_db
+from src.repository.outbox import outbox_depth
+from src.services.auth import auth_service
+from src.services.cache import user_cache
+from src.services.metrics import InstrumentedRoute, request_metrics, write_histogram, write_metric
+from src.conf.config import settings
+
+
+async def verify_internal_access(request: Request, authorization: str = Header(None)) -> None:
+    """
+    The verify_internal_access function lets a request to /internal through if it carries the internal_token
+    as a bearer token or comes from one of the internal_allowed_hosts, and raises a 403 otherwise.
+
+    :param request: Request: Get the address of the client
+    :param authorization: str: The Authorization header
+    :return: None
+    """
+    if settings.internal_token and authorization:
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and hmac.compare_digest(token.encode(), settings.internal_token.encode()):
+            return
+    if request.client and request.client.host in settings.internal_allowed_hosts:
+        return
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+
+
+router = APIRouter(prefix="/internal", tags=["internal"], include_in_schema=False, route_class=InstrumentedRoute,
+                   dependencies=[Depends(verify_internal_access)])
+
+
+def cache_stats() -> dict:
+    return {"user": user_cache.stats(), "token": auth_service.tokens.cache.stats()}
+
+
+@router.get("/pool")
+async def pool_stats():
+    """
+    The pool_stats function reports the live state of the database connection pool:
+    its size, the connections checked in and out, the overflow in use and a
+    histogram of how long checkouts waited for a connection.
+
+    :return: A dictionary with the pool statistics
+    """
+    return engine.sync_engine.pool.stats()
+
+
+@router.get("/caches")
+async def caches():
+    """
+    The caches function reports the in-process caches of this worker, the users and the verified tokens:
+    their size and the hits and misses since the worker started.
+
+    :return: A dictionary with the statistics of every cache
+    """
+    return cache_stats()
+
+
+@router.get("/outbox")
+async def outbox_stats(db: AsyncSession = Depends(get_db)):
+    """
+    The outbox_stats function reports the depth of the email outbox: the emails waiting to be sent
+    and the emails the worker gave up on.
+
+    :param db: AsyncSession: Pass the database session to the repository
+    :return: A dictionary with the number of pending and failed emails
+    """
+    return await outbox_depth(db)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    The metrics function exports the request metrics of this worker in the Prometheus text format:
+    latency histograms of every route by stage (total, auth, db, serialization), the number of
+    database queries per request, how long checkouts waited for a database connection and
+    the hits, misses and size of the in-process caches.
+
+    :return: The metrics as text
+    """
+    lines = []
+    write_histogram(lines, "db_pool_wait_seconds", "Time spent waiting for a database connection.",
+                    [({}, engine.sync_engine.pool.wait_time)])
+    stats = cache_stats()
+    write_metric(lines, "cache_hits_total", "counter", "Lookups answered by an in-process cache.",
+                 (({"cache": name}, cache["hits"]) for name, cache in stats.items()))
+    write_metric(lines, "cache_misses_total", "counter", "Lookups an in-process cache could not answer.",
+                 (({"cache": name}, cache["misses"]) for name, cache in stats.items()))
+    write_metric(lines, "cache_entries", "gauge", "Entries held by an in-process cache.",
+                 (({"cache": name}, cache["size"]) for name, cache in stats.items()))
+    return PlainTextResponse(request_metrics.render() + "\n".join(lines) + "\n",
+                             media_type="text/plain; version=0.0.4")
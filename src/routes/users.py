@@ -1,16 +1,17 @@
-from fastapi import APIRouter, Depends, status, UploadFile, File
-from sqlalchemy.orm import Session
-import cloudinary
-import cloudinary.uploader
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from PIL import Image
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.connect import get_db
 from src.database.models import User
 from src.repository import users as repository_users
 from src.services.auth import auth_service
+from src.services.avatars import AvatarStorage, InvalidImageError, avatar_pool, get_avatar_storage, process_avatar
+from src.services.uploads import LimitedBodyRoute, read_upload
 from src.conf.config import settings
 from src.schemas import UserDb
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], route_class=LimitedBodyRoute)
 
 
 @router.get("/me/", response_model=UserDb)
@@ -28,29 +29,30 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 
 @router.patch('/avatar', response_model=UserDb)
 async def update_avatar_user(file: UploadFile = File(), current_user: User = Depends(auth_service.get_current_user),
-                             db: Session = Depends(get_db)):
+                             storage: AvatarStorage = Depends(get_avatar_storage),
+                             db: AsyncSession = Depends(get_db)):
     """
     The update_avatar_user function updates the avatar of a user.
+        The image is cropped and scaled to avatar_size x avatar_size pixels before it is stored, and both steps
+        run in the avatar pool, so neither the resizing nor the upload to the storage blocks the event loop.
+        Files larger than avatar_max_bytes are rejected with 413 while they are being received.
         Args:
             file (UploadFile): The image file to be uploaded.
             current_user (User): The currently logged in user.  This is passed by the auth_service dependency, which uses JWT tokens to authenticate users and pass their information into this function as an argument.  It's used here so that we can update only the avatar of the currently logged in user, not any other users' avatars!
-            db (Session): A database session object provided by FastAPI's Depends() method, which allows us to access our database from
+            storage (AvatarStorage): Where the avatar is stored, Cloudinary or a local directory depending on the settings.
+            db (AsyncSession): A database session object provided by FastAPI's Depends() method, which allows us to access our database from
 
     :param file: UploadFile: Get the file uploaded by the user
     :param current_user: User: Get the current user's email
-    :param db: Session: Get the database session
+    :param storage: AvatarStorage: Store the resized avatar
+    :param db: AsyncSession: Get the database session
     :return: The user object
     :doc-author: Trelent
     """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    cloudinary.uploader.upload(file.file, public_id=f'NotesApp/{current_user.username}', overwrite=True)
-    src_url = cloudinary.CloudinaryImage(f'NotesApp/{current_user.username}')\
-                        .build_url(width=250, height=250, crop='fill')
+    data = await read_upload(file, settings.avatar_max_bytes)
+    try:
+        src_url = await avatar_pool.run(process_avatar, data, current_user.username, storage)
+    except (InvalidImageError, Image.DecompressionBombError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File is not a supported image")
     user = await repository_users.update_avatar(current_user.email, src_url, db)
     return user
@@ -1,7 +1,7 @@
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, root_validator
 
 
 class ContactModel(BaseModel):
@@ -26,6 +26,51 @@ class RespondsContact(BaseModel):
         orm_mode = True
 
 
+class ContactPage(BaseModel):
+    items: List[RespondsContact]
+    next_cursor: Optional[str] = None
+
+
+class ContactChanges(BaseModel):
+    items: List[RespondsContact]
+    deleted: List[int]
+    next_cursor: str
+    has_more: bool
+
+
+class ContactOperation(BaseModel):
+    op: Literal["update", "delete"]
+    id: int = Field(ge=1)
+    contact: Optional[ContactModel] = None
+
+    @root_validator(skip_on_failure=True)
+    def check_contact(cls, values):
+        if values["op"] == "update" and values.get("contact") is None:
+            raise ValueError("update needs a contact")
+        return values
+
+
+class ContactBatch(BaseModel):
+    operations: List[ContactOperation] = Field(min_items=1, max_items=1000)
+
+
+class ContactOperationResult(BaseModel):
+    id: int
+    op: str
+    status: int
+    detail: Optional[str] = None
+
+
+class ContactImportError(BaseModel):
+    row: int
+    error: str
+
+
+class ContactImportResult(BaseModel):
+    imported: int
+    failed: List[ContactImportError]
+
+
 class UserModel(BaseModel):
     username: str = Field(min_length=5, max_length=16)
     email: str
@@ -1,25 +1,27 @@
 from typing import Optional
-import pickle
+from uuid import uuid4
 
-import redis as redis
-from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.connect import get_db
 from src.repository import users as repository_users
+from src.services.cache import get_cached_user, set_cached_user
+from src.services import hashing
+from src.services.tokens import TokenError, create_verifier
+from src.services.metrics import stage
+from src.services.revocation import revocation_list
 from src.conf.config import settings
 
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = hashing.pwd_context
     SECRET_KEY = settings.secret_key_jwt
     ALGORITHM = settings.algorithm
+    tokens = create_verifier()
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-    r = redis.Redis(host='localhost', port=6379, db=0)
 
     def verify_password(self, plain_password, hashed_password):
         """
@@ -47,6 +49,30 @@ class Auth:
         """
         return self.pwd_context.hash(password)
 
+    async def verify_password_async(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        The verify_password_async function checks a password like verify_password,
+        but runs bcrypt in the hashing pool so the event loop is not blocked.
+        If the pool is saturated it raises an HTTPException with status code 503.
+
+        :param self: Represent the instance of the class
+        :param plain_password: str: Pass the password that is entered by the user
+        :param hashed_password: str: The hashed password stored in the database
+        :return: A boolean value of true or false
+        """
+        return await hashing.hashing_pool.run(hashing.verify_password, plain_password, hashed_password)
+
+    async def get_password_hash_async(self, password: str) -> str:
+        """
+        The get_password_hash_async function hashes a password in the hashing pool.
+        If the pool is saturated it raises an HTTPException with status code 503.
+
+        :param self: Represent the instance of the class
+        :param password: str: Specify the password that will be hashed
+        :return: A hash of the password
+        """
+        return await hashing.hashing_pool.run(hashing.hash_password, password)
+
     # define a function to generate a new access token
     async def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
         """
@@ -67,8 +93,8 @@ class Auth:
             expire = datetime.utcnow() + timedelta(seconds=expires_delta)
         else:
             expire = datetime.utcnow() + timedelta(minutes=15)
-        to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"})
-        encoded_access_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "access_token", "jti": uuid4().hex})
+        encoded_access_token = self.tokens.encode(to_encode)
         return encoded_access_token
 
     # define a function to generate a new refresh token
@@ -91,7 +117,7 @@ class Auth:
         else:
             expire = datetime.utcnow() + timedelta(days=14)
         to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"})
-        encoded_refresh_token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        encoded_refresh_token = self.tokens.encode(to_encode)
         return encoded_refresh_token
 
     async def decode_refresh_token(self, refresh_token: str):
@@ -107,15 +133,15 @@ class Auth:
         :doc-author: Trelent
         """
         try:
-            payload = jwt.decode(refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.tokens.decode(refresh_token)
             if payload['scope'] == 'refresh_token':
                 username = payload['sub']
                 return username
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid scope for token')
-        except JWTError:
+        except TokenError:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Could not validate credentials')
 
-    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    async def get_current_user(self, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
         """
         The get_current_user function is a dependency that will be used in the
             protected endpoints. It takes a token as an argument and returns the user
@@ -123,37 +149,37 @@ class Auth:
 
         :param self: Access the class attributes
         :param token: str: Get the token from the header of a request
-        :param db: Session: Get the database session
+        :param db: AsyncSession: Get the database session
         :return: The user object from the database
         :doc-author: Trelent
         """
-        credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-        )
-
-        try:
-            # Decode JWT
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
-            if payload['scope'] == 'access_token':
-                username = payload["sub"]
-                if username is None:
+        with stage("auth"):
+            credentials_exception = HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Could not validate credentials",
+            )
+
+            try:
+                # Decode JWT
+                payload = self.tokens.decode(token)
+                if payload['scope'] == 'access_token':
+                    username = payload["sub"]
+                    if username is None:
+                        raise credentials_exception
+                else:
                     raise credentials_exception
-            else:
+            except TokenError as e:
+                raise credentials_exception
+            if await revocation_list.is_revoked(payload.get("jti")):
                 raise credentials_exception
-        except JWTError as e:
-            raise credentials_exception
 
-        user = self.r.get(f"user:{username}")
-        if user is None:
-            user = await repository_users.get_user_by_username(username, db)
+            user = await get_cached_user(username)
             if user is None:
-                raise credentials_exception
-            self.r.set(f"user:{username}", pickle.dumps(user))
-            self.r.expire(f"user:{username}", 900)
-        else:
-            user = pickle.loads(user)
-        return user
+                user = await repository_users.get_user_by_username(username, db)
+                if user is None:
+                    raise credentials_exception
+                await set_cached_user(user)
+            return user
 
     def create_email_token(self, data: dict):
         """
@@ -169,7 +195,7 @@ class Auth:
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(days=7)
         to_encode.update({"iat": datetime.utcnow(), "exp": expire, "scope": "email_token"})
-        token = jwt.encode(to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM)
+        token = self.tokens.encode(to_encode)
         return token
 
     async def get_email_from_token(self, token: str):
@@ -186,14 +212,14 @@ class Auth:
         :doc-author: Trelent
         """
         try:
-            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+            payload = self.tokens.decode(token)
             if payload['scope'] == 'email_token':
                 email = payload["sub"]
                 return email
             else:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid scope for token')
 
-        except JWTError as e:
+        except TokenError as e:
             print(e)
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                                 detail="Invalid token for email verification")
@@ -0,0 +1,129 @@
+import io
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from urllib.parse import quote
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from src.conf.config import settings
+from src.services.clients import clients
+from src.services.executors import BoundedExecutor
+
+
+class InvalidImageError(ValueError):
+    """
+    The upload is not an image Pillow can decode: an unknown format, or a truncated or corrupt file.
+    """
+
+
+def resize_avatar(data: bytes, size: int = settings.avatar_size) -> bytes:
+    """
+    The resize_avatar function crops an image to a square in its center and scales it to size x size,
+    the same way Cloudinary's crop='fill' did. JPEG files are decoded at the smallest scale that is
+    still larger than the result, so a large photo is never decoded at full resolution.
+
+    :param data: bytes: The uploaded image
+    :param size: int: Width and height of the avatar in pixels
+    :return: The avatar encoded as JPEG
+    :raises InvalidImageError: The data cannot be decoded
+    """
+    # Image.open reads only the header, a truncated or corrupt file fails when the pixels are decoded
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.draft("RGB", (size, size))
+            image.load()
+            image = ImageOps.exif_transpose(image).convert("RGB")
+    except (UnidentifiedImageError, OSError) as err:
+        raise InvalidImageError(str(err)) from err
+    avatar = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    avatar.save(output, "JPEG", quality=85, optimize=True)
+    return output.getvalue()
+
+
+class AvatarStorage(ABC):
+    """
+    Where avatars are stored. save is blocking and runs in the avatar pool.
+    """
+
+    @abstractmethod
+    def save(self, name: str, data: bytes) -> str:
+        """
+        The save function stores the avatar of a user, replacing the previous one.
+
+        :param name: str: Unique name of the avatar, the username
+        :param data: bytes: The avatar encoded as JPEG
+        :return: The url of the stored avatar
+        """
+
+
+class CloudinaryStorage(AvatarStorage):
+    """
+    Uploads avatars to Cloudinary. The SDK is imported and configured once, when the storage is created.
+    """
+
+    def __init__(self, cloud_name: str, api_key: str, api_secret: str, folder: str = "NotesApp"):
+        import cloudinary
+        import cloudinary.uploader
+
+        cloudinary.config(cloud_name=cloud_name, api_key=api_key, api_secret=api_secret, secure=True)
+        self.cloudinary = cloudinary
+        self.folder = folder
+
+    def save(self, name: str, data: bytes) -> str:
+        public_id = f"{self.folder}/{name}"
+        result = self.cloudinary.uploader.upload(io.BytesIO(data), public_id=public_id, overwrite=True)
+        return self.cloudinary.CloudinaryImage(public_id).build_url(width=settings.avatar_size,
+                                                                    height=settings.avatar_size, crop="fill",
+                                                                    version=result.get("version"))
+
+
+class LocalStorage(AvatarStorage):
+    """
+    Keeps avatars in a directory served by the application under base_url.
+    """
+
+    def __init__(self, directory: str | Path, base_url: str):
+        self.directory = Path(directory)
+        self.base_url = base_url.rstrip("/")
+
+    def save(self, name: str, data: bytes) -> str:
+        filename = f"{quote(name, safe='')}.jpg"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # readers never see a half written file
+        tmp = self.directory / f"{filename}.tmp"
+        tmp.write_bytes(data)
+        tmp.replace(self.directory / filename)
+        return f"{self.base_url}/{filename}?v={time.time_ns()}"
+
+
+def create_avatar_storage() -> AvatarStorage:
+    if settings.avatar_storage == "local":
+        return LocalStorage(settings.avatar_local_dir, settings.avatar_local_url)
+    credentials = (settings.cloudinary_name, settings.cloudinary_api_key, settings.cloudinary_api_secret)
+    if not all(credentials):
+        raise RuntimeError("avatar_storage is cloudinary but the cloudinary_* settings are not set")
+    return CloudinaryStorage(*credentials)
+
+
+clients.register("avatar_storage", create_avatar_storage)
+
+
+def get_avatar_storage() -> AvatarStorage:
+    """
+    The get_avatar_storage function returns the storage selected by the avatar_storage setting,
+    cloudinary or local. It is created on first use, once per worker, and is a dependency,
+    so tests can override it.
+
+    :return: The avatar storage
+    """
+    return clients.get("avatar_storage")
+
+
+def process_avatar(data: bytes, name: str, storage: AvatarStorage) -> str:
+    return storage.save(name, resize_avatar(data))
+
+
+avatar_pool = BoundedExecutor(kind="thread", workers=settings.avatar_pool_workers,
+                              max_pending=settings.avatar_pool_max_pending, name="avatar")
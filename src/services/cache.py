@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from time import monotonic
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlencode
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from src.database.models import User
+from src.services.clients import clients
+from src.conf.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def create_redis() -> redis.Redis:
+    pool = redis.ConnectionPool(host=settings.redis_host, port=settings.redis_port, db=0,
+                                max_connections=settings.redis_max_connections)
+    return redis.Redis(connection_pool=pool)
+
+
+async def close_redis(client: redis.Redis) -> None:
+    await client.close()
+    await client.connection_pool.disconnect()
+
+
+redis_client = clients.register("redis", create_redis, close=close_redis)
+
+# Order of the fields in the cached tuple, never reorder without bumping the version in USER_KEY.
+# v1 entries, user:{username}, held pickled users and are left to expire.
+USER_FIELDS = ("id", "username", "email", "created_at", "confirmed", "avatar")
+USER_KEY = "user:v2:{username}"
+CONTACTS_GENERATION_KEY = "contacts:gen:{user_id}"
+CONTACTS_KEY = "contacts:{user_id}:{endpoint}:{params}"
+
+
+class LRUCache:
+    """
+    Bounded in-process LRU cache whose entries expire after ttl seconds.
+    It is not shared between workers, so ttl bounds how long a worker can serve a stale entry.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key):
+        """
+        The get function returns the cached value and marks it as recently used.
+
+        :param key: Key of the entry
+        :return: The cached value or None if it is missing or expired
+        """
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        value, expires_at = item
+        if expires_at <= monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float | None = None) -> None:
+        """
+        The set function stores a value and evicts the least recently used entry when the cache is full.
+
+        :param key: Key of the entry
+        :param value: Value to cache
+        :param ttl: float | None: Expire the entry sooner than the ttl of the cache
+        :return: None
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (value, monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+user_cache = LRUCache(maxsize=settings.user_cache_l1_size, ttl=settings.user_cache_l1_ttl)
+
+
+def pack_user(user: User) -> bytes:
+    """
+    The pack_user function encodes the public fields of a user as a compact json array.
+    The password hash and the refresh token are never written to the cache.
+
+    :param user: User: The user to encode
+    :return: The encoded user
+    """
+    created_at = user.created_at.isoformat() if user.created_at else None
+    row = (user.id, user.username, user.email, created_at, user.confirmed, user.avatar)
+    return json.dumps(row, separators=(",", ":")).encode()
+
+
+def unpack_user(data: bytes) -> User:
+    """
+    The unpack_user function builds a detached User from the array written by pack_user.
+
+    :param data: bytes: The encoded user
+    :return: A user object that is not attached to any session
+    """
+    fields = dict(zip(USER_FIELDS, json.loads(data)))
+    if fields["created_at"]:
+        fields["created_at"] = datetime.fromisoformat(fields["created_at"])
+    return User(**fields)
+
+
+async def get_cached_user(username: str) -> User | None:
+    """
+    The get_cached_user function reads a user from the in-process cache and falls back to redis.
+    An unavailable redis and an entry that cannot be decoded are treated as a cache miss.
+
+    :param username: str: The username of the user
+    :return: The cached user or None
+    """
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+    try:
+        data = await redis_client.get(USER_KEY.format(username=username))
+    except RedisError as err:
+        logger.warning("User cache read failed: %s", err)
+        return None
+    if data is None:
+        return None
+    try:
+        user = unpack_user(data)
+    except (ValueError, TypeError, KeyError) as err:
+        logger.warning("User cache entry of %s could not be decoded: %s", username, err)
+        return None
+    user_cache.set(username, user)
+    return user
+
+
+async def set_cached_user(user: User) -> None:
+    """
+    The set_cached_user function writes a user to the in-process cache and
+    to redis with a single SET ... EX command.
+
+    :param user: User: The user to cache
+    :return: None
+    """
+    data = pack_user(user)
+    user_cache.set(user.username, unpack_user(data))
+    try:
+        await redis_client.set(USER_KEY.format(username=user.username), data, ex=settings.user_cache_ttl)
+    except RedisError as err:
+        logger.warning("User cache write failed: %s", err)
+
+
+async def invalidate_user(username: str) -> None:
+    """
+    The invalidate_user function drops a user from both cache levels after the user has been changed.
+
+    :param username: str: The username of the changed user
+    :return: None
+    """
+    user_cache.invalidate(username)
+    try:
+        await redis_client.delete(USER_KEY.format(username=username))
+    except RedisError as err:
+        logger.warning("User cache invalidation failed: %s", err)
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent loads of the same key: the first caller runs the loader
+    and every caller that arrives while it is running waits for the same result.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await loader()
+        except BaseException as err:
+            future.set_exception(err)
+            # mark the exception as retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+contacts_flight = SingleFlight()
+
+
+async def cached_contacts(user_id: int, endpoint: str, params: dict, loader: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    The cached_contacts function returns the json-compatible result of loader through redis.
+        Entries are stored together with the generation of the user's contacts and one MGET reads both
+        the current generation and the entry, so a hit costs a single round-trip. An entry written
+        for an older generation is a miss. Concurrent misses for the same key in this worker share one load.
+        When redis is unavailable the loader is called directly.
+
+    :param user_id: int: Owner of the contacts
+    :param endpoint: str: Name of the cached query
+    :param params: dict: Parameters of the query, part of the key
+    :param loader: Callable[[], Awaitable[Any]]: Loads the json-compatible result from the database
+    :return: The cached or freshly loaded result
+    """
+    key = CONTACTS_KEY.format(user_id=user_id, endpoint=endpoint, params=urlencode(sorted(params.items())))
+    try:
+        generation, data = await redis_client.mget(CONTACTS_GENERATION_KEY.format(user_id=user_id), key)
+    except RedisError as err:
+        logger.warning("Contacts cache read failed: %s", err)
+        return await loader()
+    generation = int(generation or 0)
+    if data is not None:
+        cached_generation, value = json.loads(data)
+        if cached_generation == generation:
+            return value
+
+    async def load():
+        value = await loader()
+        try:
+            await redis_client.set(key, json.dumps([generation, value], separators=(",", ":"), default=str),
+                                   ex=settings.contacts_cache_ttl)
+        except RedisError as err:
+            logger.warning("Contacts cache write failed: %s", err)
+        return value
+
+    return await contacts_flight.do(f"{key}:{generation}", load)
+
+
+async def invalidate_contacts(user_id: int) -> None:
+    """
+    The invalidate_contacts function makes every cached contacts entry of the user stale with one INCR.
+
+    :param user_id: int: Owner of the changed contacts
+    :return: None
+    """
+    try:
+        await redis_client.incr(CONTACTS_GENERATION_KEY.format(user_id=user_id))
+    except RedisError as err:
+        logger.warning("Contacts cache invalidation failed: %s", err)
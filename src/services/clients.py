@@ -0,0 +1,106 @@
+import inspect
+import logging
+import os
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """
+    Clients of the external services a worker talks to: the database, redis, SMTP and Cloudinary.
+    Each one is created by its factory on first use, once per worker process, so importing the
+    application opens nothing and configures nothing, and closed in reverse order at shutdown.
+    """
+
+    def __init__(self):
+        self._factories: dict[str, tuple[Callable[[], Any], Callable[[Any], Any] | None]] = {}
+        self._clients: dict[str, Any] = {}
+        self._pid = os.getpid()
+
+    def register(self, name: str, factory: Callable[[], Any], close: Callable[[Any], Any] | None = None) -> "LazyClient":
+        """
+        The register function adds a client to the registry without creating it.
+
+        :param name: str: Unique name of the client
+        :param factory: Callable: Creates the client
+        :param close: Callable | None: Closes the client, sync or async
+        :return: A stand-in for the client that creates it on first use
+        """
+        if name in self._factories:
+            raise ValueError(f"Client {name} is already registered")
+        self._factories[name] = (factory, close)
+        return LazyClient(self, name)
+
+    def get(self, name: str) -> Any:
+        """
+        The get function returns the client, creating it the first time it is asked for.
+
+        :param name: str: Name of the client
+        :return: The client
+        """
+        client = self._clients.get(name)
+        if client is None:
+            factory, _ = self._factories[name]
+            client = self._clients[name] = factory()
+        return client
+
+    def created(self) -> list[str]:
+        return list(self._clients)
+
+    def open(self) -> None:
+        """
+        The open function starts the life of the clients in this worker. Clients created in the
+        parent process before the worker was forked share its sockets, so they are dropped unclosed
+        and created again here on first use.
+
+        :return: None
+        """
+        if self._pid != os.getpid():
+            self._clients.clear()
+            self._pid = os.getpid()
+
+    async def close(self) -> None:
+        """
+        The close function closes the created clients, the last created first, and forgets them.
+        A client that fails to close does not keep the others open.
+
+        :return: None
+        """
+        for name in reversed(self.created()):
+            client = self._clients.pop(name)
+            _, close = self._factories[name]
+            if close is None:
+                continue
+            try:
+                result = close(client)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Closing client %s failed", name)
+
+
+class LazyClient:
+    """
+    Stands in for a client of the registry: the client is created on the first attribute access
+    or call and every access is passed on to it. Modules keep referring to it by a plain name,
+    which tests can patch as before.
+    """
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: ClientRegistry, name: str):
+        self._registry = registry
+        self._name = name
+
+    def __getattr__(self, attr: str):
+        return getattr(self._registry.get(self._name), attr)
+
+    def __call__(self, *args, **kwargs):
+        return self._registry.get(self._name)(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<LazyClient {self._name}>"
+
+
+clients = ClientRegistry()
@@ -1,51 +1,33 @@
 from pathlib import Path
 
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.repository.outbox import enqueue_email
 from src.services.auth import auth_service
-from src.conf.config import settings
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=EmailStr(settings.mail_username),
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="My contacts app",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
+TEMPLATE_FOLDER = Path(__file__).parent / 'templates'
 
 
-async def send_email(email: EmailStr, username: str, host: str):
+async def send_email(email: EmailStr, username: str, host: str, db: AsyncSession):
     """
-    The send_email function sends an email to the user with a link to confirm their email address.
-        The function takes in three parameters:
+    The send_email function queues an email to the user with a link to confirm their email address.
+        The email is stored in the outbox in the database and sent by the outbox worker
+        (python -m src.services.outbox), so a slow or unavailable SMTP server does not hold up
+        the request and a restart does not lose the email.
+        The function takes in four parameters:
             -email: EmailStr, the user's email address.
             -username: str, the username of the user who is registering for an account.  This will be used in a greeting message within the body of the email sent to them.
             -host: str, this is where we are hosting our application (i.e., localhost).  This will be used as part of a URL that they can click on within their browser.
+            -db: AsyncSession, the session the email is stored with.
 
     :param email: EmailStr: Specify the email address of the recipient
     :param username: str: Pass the username to the email template
     :param host: str: Create the link to confirm the email
-    :return: A coroutine
+    :param db: AsyncSession: Pass the database session to the outbox
+    :return: The queued email
     :doc-author: Trelent
     """
-    try:
-        token_verification = auth_service.create_email_token({"sub": email})
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
-    except ConnectionErrors as err:
-        print(err)
+    token_verification = auth_service.create_email_token({"sub": email})
+    return await enqueue_email(email, "Confirm your email ", "email_template.html",
+                               {"host": str(host), "username": username, "token": token_verification}, db)
@@ -0,0 +1,32 @@
+from fastapi import Response, status
+
+
+def make_etag(version: int) -> str:
+    """
+    The make_etag function builds a weak ETag from the version of a user's contacts.
+
+    :param version: int: The latest value of the user's change sequence
+    :return: A weak entity tag
+    """
+    return f'W/"{version}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    The etag_matches function compares the If-None-Match header of a request with the current ETag.
+    The comparison is weak, as required for If-None-Match, so the W/ prefix is ignored on both sides.
+
+    :param if_none_match: str | None: Value of the If-None-Match header
+    :param etag: str: The current ETag
+    :return: True if the client already has the current representation
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,52 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+
+class BoundedExecutor:
+    """
+    Runs blocking calls off the event loop in a thread or process pool.
+    At most max_pending calls may be running or waiting; further calls are rejected with 503.
+    """
+
+    def __init__(self, kind: str, workers: int, max_pending: int, name: str):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.name = name
+        self.pending = 0
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run(self, func, *args):
+        """
+        The run function executes func in the pool and waits for the result without blocking the event loop.
+
+        :param func: Module level function to call, it has to be picklable for the process pool
+        :param args: Arguments of the function
+        :return: The result of the function
+        """
+        if self.pending >= self.max_pending:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Server is busy, try again later",
+                                headers={"Retry-After": "1"})
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,36 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, Sequence
+
+
+async def ndjson_lines(rows: AsyncIterator, fields: Sequence[str]) -> AsyncIterator[bytes]:
+    """
+    The ndjson_lines function encodes every row as one json object per line.
+
+    :param rows: AsyncIterator: Rows with the given fields
+    :param fields: Sequence[str]: Names of the row columns
+    :return: An async iterator of encoded lines
+    """
+    async for row in rows:
+        yield (json.dumps(dict(zip(fields, row)), default=str) + "\n").encode()
+
+
+async def csv_lines(rows: AsyncIterator, fields: Sequence[str]) -> AsyncIterator[bytes]:
+    """
+    The csv_lines function encodes the rows as csv, starting with a header line.
+
+    :param rows: AsyncIterator: Rows with the given fields
+    :param fields: Sequence[str]: Names of the row columns
+    :return: An async iterator of encoded lines
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    async for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
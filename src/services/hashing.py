@@ -0,0 +1,18 @@
+from passlib.context import CryptContext
+
+from src.conf.config import settings
+from src.services.executors import BoundedExecutor
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+hashing_pool = BoundedExecutor(kind=settings.hash_pool_kind, workers=settings.hash_pool_workers,
+                               max_pending=settings.hash_pool_max_pending, name="bcrypt")
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable
+
+import aiosmtplib
+import redis.asyncio as redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.connect import ASYNC_DATABASE_URL
+from src.services.clients import clients
+from src.conf.config import settings
+
+logger = logging.getLogger(__name__)
+
+# the checks get their own connections, a probe never waits for or takes one from the request pools
+health_engine = clients.register("health_db", lambda: create_async_engine(ASYNC_DATABASE_URL, pool_size=1,
+                                                                          max_overflow=0, pool_pre_ping=False),
+                                 close=lambda engine: engine.dispose())
+health_redis = clients.register("health_redis",
+                                lambda: redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0,
+                                                    single_connection_client=True,
+                                                    socket_connect_timeout=settings.health_check_timeout),
+                                close=lambda client: client.close())
+
+
+async def check_db() -> None:
+    async with health_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def check_redis() -> None:
+    await health_redis.ping()
+
+
+class SMTPCheck:
+    """
+    Keeps one connection to the mail server and sends NOOP on it, reconnecting when it was closed.
+    It does not log in, the outbox worker is the one sending emails.
+    """
+
+    def __init__(self):
+        self._smtp: aiosmtplib.SMTP | None = None
+
+    async def __call__(self) -> None:
+        if self._smtp is None or not self._smtp.is_connected:
+            self._smtp = aiosmtplib.SMTP(hostname=settings.mail_server, port=settings.mail_port,
+                                         use_tls=settings.mail_ssl_tls, start_tls=settings.mail_starttls,
+                                         validate_certs=settings.mail_validate_certs,
+                                         timeout=settings.health_check_timeout)
+            await self._smtp.connect()
+        try:
+            await self._smtp.noop()
+        except (aiosmtplib.SMTPException, OSError):
+            self._smtp.close()
+            self._smtp = None
+            raise
+
+    async def close(self) -> None:
+        if self._smtp is not None and self._smtp.is_connected:
+            try:
+                await self._smtp.quit()
+            except aiosmtplib.SMTPException:
+                self._smtp.close()
+        self._smtp = None
+
+
+class HealthChecker:
+    """
+    Runs the dependency checks in the background every interval seconds and keeps their latest results,
+    so answering a probe does no I/O. The results are stale when no round of checks finished
+    for three intervals, and a worker with stale results is not ready.
+    """
+
+    def __init__(self, checks: dict[str, Callable[[], Awaitable[None]]], required: list[str],
+                 interval: float, timeout: float):
+        self.checks = checks
+        self.required = required
+        self.interval = interval
+        self.timeout = timeout
+        self.results: dict[str, dict] = {}
+        self.checked_at: float | None = None
+        self._task: asyncio.Task | None = None
+
+    async def run_check(self, name: str, check: Callable[[], Awaitable[None]]) -> dict:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(check(), self.timeout)
+            error = None
+        except Exception as err:
+            error = f"{type(err).__name__}: {err}" if str(err) else type(err).__name__
+            logger.warning("Health check %s failed: %s", name, error)
+        return {"ok": error is None, "latency_ms": round((time.perf_counter() - start) * 1000, 1), "error": error,
+                "checked_at": datetime.utcnow().isoformat()}
+
+    async def run_once(self) -> None:
+        """
+        The run_once function runs all checks at the same time and replaces the results.
+
+        :return: None
+        """
+        names = list(self.checks)
+        results = await asyncio.gather(*(self.run_check(name, self.checks[name]) for name in names))
+        self.results = dict(zip(names, results))
+        self.checked_at = time.monotonic()
+
+    @property
+    def stale(self) -> bool:
+        return self.checked_at is None or time.monotonic() - self.checked_at > 3 * self.interval
+
+    @property
+    def ready(self) -> bool:
+        return not self.stale and all(self.results.get(name, {}).get("ok") for name in self.required)
+
+    def report(self) -> dict:
+        """
+        The report function returns the readiness of the worker and the latest result of every check.
+
+        :return: A dictionary with the status, ready or not_ready, and the checks
+        """
+        return {"status": "ready" if self.ready else "not_ready", "stale": self.stale, "checks": self.results}
+
+    async def run(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+smtp_check = clients.register("health_smtp", SMTPCheck, close=SMTPCheck.close)
+health_checker = HealthChecker({"db": check_db, "redis": check_redis, "smtp": smtp_check},
+                               required=settings.health_required_checks,
+                               interval=settings.health_check_interval, timeout=settings.health_check_timeout)
@@ -0,0 +1,268 @@
+import functools
+import inspect
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from fastapi import Request
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values in seconds, with the bucket layout used by Prometheus.
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        """
+        The snapshot function returns the cumulative count of observations for every upper bound.
+
+        :return: A dictionary with the buckets, the total count and the sum of the observed values
+        """
+        buckets, total = {}, 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            buckets[str(bound)] = total
+        buckets["+Inf"] = self.count
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+current_timings: ContextVar["RequestTimings | None"] = ContextVar("current_timings", default=None)
+
+
+class RequestTimings:
+    """
+    Time spent in every stage of the request being served and the number of database queries it made.
+    The stages overlap: auth includes the lookup of the user in the database.
+    """
+
+    def __init__(self):
+        self.route: str | None = None
+        self.stages: dict[str, float] = {"db": 0.0}
+        self.queries = 0
+        self.endpoint_done: float | None = None
+        self.response_started: float | None = None
+
+    def add(self, name: str, elapsed: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def stage(name: str):
+    """
+    The stage function adds the time spent in the with block to the stage name of the current request.
+    Outside a request it does nothing.
+
+    :param name: str: Name of the stage
+    """
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, perf_counter() - start)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    The instrument_engine function counts the queries and adds their time to the db stage
+    of the request that sent them.
+
+    :param engine: Engine: The engine, for an async engine its sync_engine
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["query_start"].pop()
+        timings = current_timings.get()
+        if timings is not None:
+            timings.queries += 1
+            timings.add("db", elapsed)
+
+
+def timed_endpoint(endpoint):
+    """
+    The timed_endpoint function wraps an async endpoint to note when it returned, which is where
+    the serialization of its result into the response starts.
+
+    :param endpoint: The endpoint function
+    :return: The wrapped endpoint, with the signature FastAPI reads the parameters from
+    """
+    if not inspect.iscoroutinefunction(endpoint) or getattr(endpoint, "__timed__", False):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings = current_timings.get()
+            if timings is not None:
+                timings.endpoint_done = perf_counter()
+
+    wrapper.__timed__ = True
+    return wrapper
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    Route that labels the metrics of its requests with its path template and times the serialization
+    of the response. The route of every router has to be one, including routes derived from it.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def instrumented_handler(request: Request):
+            timings = current_timings.get()
+            if timings is not None:
+                timings.route = route
+            return await handler(request)
+
+        return instrumented_handler
+
+
+class RequestMetrics:
+    """
+    Per route latency histograms of every stage and histograms of the number of queries per request.
+    """
+
+    def __init__(self):
+        self.latency: dict[tuple, Histogram] = {}
+        self.queries: dict[tuple, Histogram] = {}
+
+    def record(self, method: str, route: str, timings: RequestTimings) -> None:
+        for name, elapsed in timings.stages.items():
+            key = (method, route, name)
+            if key not in self.latency:
+                self.latency[key] = Histogram()
+            self.latency[key].observe(elapsed)
+        key = (method, route)
+        if key not in self.queries:
+            self.queries[key] = Histogram(buckets=QUERY_BUCKETS)
+        self.queries[key].observe(timings.queries)
+
+    def render(self) -> str:
+        """
+        The render function returns the metrics in the Prometheus text exposition format.
+
+        :return: The metrics as text
+        """
+        lines = []
+        write_histogram(lines, "http_request_duration_seconds", "Request latency by route and stage.",
+                        (({"method": method, "route": route, "stage": name}, histogram)
+                         for (method, route, name), histogram in sorted(self.latency.items())))
+        write_histogram(lines, "http_request_db_queries", "Database queries per request by route.",
+                        (({"method": method, "route": route}, histogram)
+                         for (method, route), histogram in sorted(self.queries.items())))
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + "}"
+
+
+def write_histogram(lines: list, name: str, description: str, series) -> None:
+    """
+    The write_histogram function appends a histogram metric in the Prometheus text format to lines.
+
+    :param lines: list: Lines of the exposition
+    :param name: str: Name of the metric
+    :param description: str: Help text of the metric
+    :param series: Pairs of labels and the histogram of these labels
+    """
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in series:
+        snapshot = histogram.snapshot()
+        for bound, count in snapshot["buckets"].items():
+            lines.append(f"{name}_bucket{format_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_sum{format_labels(labels)} {snapshot['sum']}")
+        lines.append(f"{name}_count{format_labels(labels)} {snapshot['count']}")
+
+
+def write_metric(lines: list, name: str, kind: str, description: str, series) -> None:
+    """
+    The write_metric function appends a counter or gauge metric in the Prometheus text format to lines.
+
+    :param lines: list: Lines of the exposition
+    :param name: str: Name of the metric
+    :param kind: str: counter or gauge
+    :param description: str: Help text of the metric
+    :param series: Pairs of labels and the value of these labels
+    """
+    lines.append(f"# HELP {name} {description}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in series:
+        lines.append(f"{name}{format_labels(labels)} {value}")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that times every HTTP request and records its stages in metrics.
+    Requests that match no instrumented route are recorded under the route "unmatched".
+    """
+
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = perf_counter()
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start" and timings.response_started is None:
+                timings.response_started = perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            current_timings.reset(token)
+            timings.stages["total"] = perf_counter() - start
+            if timings.endpoint_done is not None and timings.response_started is not None:
+                timings.stages["serialization"] = max(timings.response_started - timings.endpoint_done, 0.0)
+            self.metrics.record(scope["method"], timings.route or "unmatched", timings)
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,190 @@
+"""
+Outbox worker: sends the emails queued by src.services.email.
+
+Run it next to the application with
+
+    python -m src.services.outbox
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from email.utils import formataddr
+
+import aiosmtplib
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.conf.config import settings
+from src.database.connect import SessionLocal
+from src.database.models import EmailOutbox
+from src.repository import outbox as repository_outbox
+from src.services.rendering import renderer
+
+logger = logging.getLogger(__name__)
+
+MAIL_FROM_NAME = "My contacts app"
+
+
+def build_messages(emails: list[EmailOutbox]) -> list[MIMEText | Exception]:
+    """
+    The build_messages function renders a batch of queued emails into MIME messages,
+    looking up the template of every template name once.
+    An email that cannot be rendered, because its template is missing, its template_body is not json
+    or the template fails, gets the exception in place of its message and does not affect the others.
+    The messages use the compat32 MIME classes, which store headers as given instead of
+    parsing every address header like EmailMessage does.
+
+    :param emails: list[EmailOutbox]: The queued emails
+    :return: The messages ready to be sent or the rendering errors, in the order of emails
+    """
+    templates = {}
+    sender = formataddr((MAIL_FROM_NAME, settings.mail_username))
+    messages = []
+    for email in emails:
+        try:
+            template = templates.get(email.template_name)
+            if template is None:
+                template = templates[email.template_name] = renderer.get(email.template_name)
+            html = template.render(json.loads(email.template_body))
+        except Exception as err:
+            messages.append(err)
+            continue
+        message = MIMEText(html, "html", "utf-8")
+        message["From"] = sender
+        message["To"] = email.recipient
+        message["Subject"] = email.subject
+        messages.append(message)
+    return messages
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    The retry_delay function returns how long to wait after the given number of failed attempts,
+    doubling with every attempt up to outbox_retry_max seconds.
+
+    :param attempts: int: Number of failed attempts so far, at least 1
+    :return: The delay in seconds
+    """
+    return min(settings.outbox_retry_base * 2 ** (attempts - 1), settings.outbox_retry_max)
+
+
+class OutboxWorker:
+    """
+    Drains the email outbox in batches over one SMTP connection that is kept open between batches.
+    A message that cannot be sent is retried with exponential backoff and marked as failed
+    after outbox_max_attempts attempts. A message that cannot be rendered is marked as failed at once,
+    rendering it again would fail the same way.
+    """
+
+    def __init__(self, session_maker: async_sessionmaker, batch_size: int = settings.outbox_batch_size,
+                 max_attempts: int = settings.outbox_max_attempts):
+        self.session_maker = session_maker
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.connections = 0
+        self._smtp: aiosmtplib.SMTP | None = None
+
+    async def connect(self) -> aiosmtplib.SMTP:
+        """
+        The connect function returns the open SMTP connection or opens a new one.
+
+        :return: A connected SMTP client
+        """
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
+        smtp = aiosmtplib.SMTP(hostname=settings.mail_server, port=settings.mail_port,
+                               use_tls=settings.mail_ssl_tls, start_tls=settings.mail_starttls,
+                               validate_certs=settings.mail_validate_certs)
+        await smtp.connect()
+        if settings.mail_use_credentials:
+            await smtp.login(settings.mail_username, settings.mail_password)
+        self._smtp = smtp
+        self.connections += 1
+        return smtp
+
+    async def send(self, message: MIMEText) -> None:
+        smtp = await self.connect()
+        try:
+            await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # the server closed the idle connection between batches
+            smtp = await self.connect()
+            await smtp.send_message(message)
+
+    async def run_once(self) -> int:
+        """
+        The run_once function sends one batch of due emails.
+        Sent emails are deleted with one statement and failed ones are rescheduled,
+        all in the transaction that claimed them.
+
+        :return: Number of emails taken from the outbox
+        """
+        async with self.session_maker() as db:
+            emails = await repository_outbox.claim_emails(db, self.batch_size)
+            sent = []
+            for email, message in zip(emails, build_messages(emails)):
+                if isinstance(message, Exception):
+                    error = f"Rendering failed: {type(message).__name__}: {message}"
+                    logger.error("Email %s marked as failed. %s", email.id, error)
+                    await repository_outbox.retry_email(email, error, None, db)
+                    continue
+                try:
+                    await self.send(message)
+                except (aiosmtplib.SMTPException, OSError) as err:
+                    attempts = email.attempts + 1
+                    retry_at = None
+                    if attempts < self.max_attempts:
+                        retry_at = datetime.utcnow() + timedelta(seconds=retry_delay(attempts))
+                    logger.warning("Sending email %s failed, attempt %s: %s", email.id, attempts, err)
+                    await repository_outbox.retry_email(email, str(err), retry_at, db)
+                else:
+                    sent.append(email.id)
+            await repository_outbox.delete_emails(sent, db)
+            await db.commit()
+        return len(emails)
+
+    async def run(self, poll_interval: float = settings.outbox_poll_interval) -> None:
+        """
+        The run function sends batches until the task is cancelled.
+        Full batches are followed by the next one right away, otherwise the worker waits poll_interval seconds.
+        A batch that fails, for example because the database is unavailable, is rolled back and the worker
+        waits with exponential backoff before it claims the emails again.
+
+        :param poll_interval: float: Seconds to wait when the outbox has no due emails
+        :return: None
+        """
+        failures = 0
+        try:
+            while True:
+                try:
+                    processed = await self.run_once()
+                except Exception:
+                    failures += 1
+                    delay = retry_delay(failures)
+                    logger.exception("Outbox batch failed, retrying in %s seconds", delay)
+                    await asyncio.sleep(delay)
+                    continue
+                failures = 0
+                if processed < self.batch_size:
+                    await asyncio.sleep(poll_interval)
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        if self._smtp is not None and self._smtp.is_connected:
+            try:
+                await self._smtp.quit()
+            except aiosmtplib.SMTPException:
+                self._smtp.close()
+        self._smtp = None
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    renderer.compile()
+    await OutboxWorker(SessionLocal).run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
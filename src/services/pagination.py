@@ -0,0 +1,29 @@
+import base64
+import binascii
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(value: int) -> str:
+    """
+    The encode_cursor function turns the last seen key into an opaque cursor for the client.
+
+    :param value: int: The key of the last returned row
+    :return: An url-safe cursor string
+    """
+    return base64.urlsafe_b64encode(str(value).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    The decode_cursor function reads the key back from a cursor made by encode_cursor.
+    A cursor that was not made by encode_cursor raises an HTTPException with status code 400.
+
+    :param cursor: str: The cursor sent by the client
+    :return: The key of the last returned row
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(cursor + padding).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
@@ -0,0 +1,115 @@
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.services.metrics import current_timings
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r"\s+")
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|(?<![:\w]):\w+")
+VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+ROW_LIST = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+
+current_query_log: ContextVar["QueryLog | None"] = ContextVar("current_query_log", default=None)
+# called with the method, the route and the query log after every request, used by the tests
+query_listeners: list[Callable[[str, str, "QueryLog"], None]] = []
+
+
+def fingerprint(statement: str) -> str:
+    """
+    The fingerprint function reduces a statement to its shape: literals and bound parameters become ?,
+    and lists of them become (?+), so statements that differ only in their values are the same.
+
+    :param statement: str: The SQL statement
+    :return: The fingerprint of the statement
+    """
+    statement = WHITESPACE.sub(" ", statement.strip())
+    statement = LITERAL.sub("?", PLACEHOLDER.sub("?", statement))
+    return ROW_LIST.sub("(?+)", VALUE_LIST.sub("(?+)", statement))
+
+
+class QueryLog:
+    """
+    Fingerprints of the statements sent to the database while serving one request.
+    """
+
+    def __init__(self):
+        self.counts: Counter[str] = Counter()
+
+    @property
+    def statements(self) -> int:
+        return sum(self.counts.values())
+
+    def record(self, statement: str) -> None:
+        self.counts[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """
+        The repeated function returns the statements sent at least threshold times,
+        the sign of a lazy load or a query in a loop.
+
+        :param threshold: int: Number of executions from which a statement is reported
+        :return: Pairs of fingerprint and count, the most frequent first
+        """
+        return [(statement, count) for statement, count in self.counts.most_common() if count >= threshold]
+
+
+def instrument_queries(engine: Engine, slow_threshold: float) -> None:
+    """
+    The instrument_queries function records every statement in the query log of the current request
+    and logs the statements that run longer than slow_threshold seconds with their parameters.
+    Parameters may hold personal data, so this is meant for development and tests only.
+
+    :param engine: Engine: The engine, for an async engine its sync_engine
+    :param slow_threshold: float: Duration in seconds from which a statement is logged
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_log_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["query_log_start"].pop()
+        log = current_query_log.get()
+        if log is not None:
+            log.record(statement)
+        if elapsed >= slow_threshold:
+            logger.warning("Slow query (%.1f ms): %s; parameters: %r", elapsed * 1000, statement, parameters)
+
+
+class QueryLogMiddleware:
+    """
+    ASGI middleware that keeps a query log for every HTTP request and logs the statements
+    it repeated at least repeat_threshold times. It has to run inside MetricsMiddleware,
+    which provides the route of the request.
+    """
+
+    def __init__(self, app, repeat_threshold: int):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        log = QueryLog()
+        token = current_query_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_query_log.reset(token)
+            timings = current_timings.get()
+            route = timings.route if timings is not None and timings.route else "unmatched"
+            for statement, count in log.repeated(self.repeat_threshold):
+                logger.warning("Possible N+1 in %s %s: %d x %s", scope["method"], route, count, statement)
+            for listener in query_listeners:
+                listener(scope["method"], route, log)
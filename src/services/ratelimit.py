@@ -0,0 +1,140 @@
+import logging
+import math
+import time
+
+from fastapi import Depends, HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from src.database.models import User
+from src.services.auth import auth_service
+from src.services.cache import LRUCache, redis_client
+from src.conf.config import settings
+
+logger = logging.getLogger(__name__)
+
+RATE_KEY = "ratelimit:{policy}:{identity}:{window}"
+
+
+def parse_limit(limit: str) -> tuple[int, int]:
+    """
+    The parse_limit function reads a limit written as requests/seconds, for example 3/60.
+
+    :param limit: str: The limit
+    :return: The number of requests and the length of the window in seconds
+    """
+    times, seconds = limit.split("/")
+    return int(times), int(seconds)
+
+
+class RateLimiter:
+    """
+    Sliding window rate limiter of one policy. Every worker shares the counts in redis,
+    two fixed windows per client whose counts are weighted by how much of the previous window
+    still overlaps the sliding one, read and written in a single pipelined round trip.
+    With local set, a token bucket per client in the worker rejects clients that used up the limit
+    in this worker alone without asking redis. When redis is unavailable only the local bucket applies.
+    """
+
+    def __init__(self, policy: str, local: bool = True, local_size: int = 10000):
+        self.policy = policy
+        self.local = local
+        limits = [settings.rate_limits.get(policy), *(overrides.get(policy)
+                                                       for overrides in settings.rate_limit_overrides.values())]
+        # a bucket left alone for the longest window is full again, so it may as well be dropped
+        self.buckets = LRUCache(maxsize=local_size, ttl=max((parse_limit(limit)[1] for limit in limits if limit),
+                                                            default=60))
+
+    def limit_for(self, username: str | None = None) -> tuple[int, int] | None:
+        """
+        The limit_for function returns the limit of the policy for a user, from rate_limit_overrides
+        if the user has one and from rate_limits otherwise.
+
+        :param username: str | None: The user, None for anonymous clients
+        :return: The number of requests and the window in seconds, None if the policy has no limit
+        """
+        limit = settings.rate_limit_overrides.get(username, {}).get(self.policy) if username else None
+        limit = limit or settings.rate_limits.get(self.policy)
+        return parse_limit(limit) if limit else None
+
+    def take_local(self, identity: str, times: int, seconds: int) -> bool:
+        now = time.monotonic()
+        bucket = self.buckets.get(identity)
+        if bucket is None:
+            bucket = [float(times), now]
+            self.buckets.set(identity, bucket)
+        tokens = min(float(times), bucket[0] + (now - bucket[1]) * times / seconds)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    async def hit(self, identity: str, times: int, seconds: int) -> float | None:
+        """
+        The hit function counts a request of a client and checks it against the limit.
+
+        :param identity: str: The client, a user id or an ip address
+        :param times: int: Number of requests allowed in the window
+        :param seconds: int: Length of the sliding window
+        :return: Seconds until the client may retry if it is over the limit, None otherwise
+        """
+        now = time.time()
+        window, elapsed = divmod(now, seconds)
+        if self.local and not self.take_local(identity, times, seconds):
+            return seconds / times
+        current_key = RATE_KEY.format(policy=self.policy, identity=identity, window=int(window))
+        previous_key = RATE_KEY.format(policy=self.policy, identity=identity, window=int(window) - 1)
+        try:
+            current, _, previous = await (redis_client.pipeline(transaction=False)
+                                          .incr(current_key)
+                                          .expire(current_key, 2 * seconds)
+                                          .get(previous_key)
+                                          .execute())
+        except RedisError as err:
+            logger.warning("Rate limit check failed: %s", err)
+            return None
+        if int(previous or 0) * (seconds - elapsed) / seconds + current > times:
+            return seconds - elapsed
+        return None
+
+    async def check(self, identity: str, username: str | None = None) -> None:
+        """
+        The check function raises an HTTPException with status code 429 if the client is over the limit.
+
+        :param identity: str: The client, a user id or an ip address
+        :param username: str | None: The user, for the per-user limits
+        :return: None
+        """
+        limit = self.limit_for(username)
+        if limit is None:
+            return
+        retry_after = await self.hit(identity, *limit)
+        if retry_after is not None:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too Many Requests",
+                                headers={"Retry-After": str(math.ceil(retry_after))})
+
+
+class UserRateLimit:
+    """
+    Dependency that limits the requests of the current user under a policy of settings.rate_limits.
+    """
+
+    def __init__(self, policy: str):
+        self.limiter = RateLimiter(policy, local=settings.rate_limit_local, local_size=settings.rate_limit_local_size)
+
+    async def __call__(self, current_user: User = Depends(auth_service.get_current_user)):
+        await self.limiter.check(f"user:{current_user.id}", current_user.username)
+
+
+class ClientRateLimit:
+    """
+    Dependency that limits the requests of a client ip address under a policy of settings.rate_limits,
+    for the routes used before logging in.
+    """
+
+    def __init__(self, policy: str):
+        self.limiter = RateLimiter(policy, local=settings.rate_limit_local, local_size=settings.rate_limit_local_size)
+
+    async def __call__(self, request: Request):
+        await self.limiter.check(f"ip:{request.client.host if request.client else 'unknown'}")
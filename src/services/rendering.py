@@ -0,0 +1,54 @@
+from pathlib import Path
+from typing import Iterable
+
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+
+from src.services.email import TEMPLATE_FOLDER
+
+
+class TemplateRenderer:
+    """
+    Renders email templates that are compiled once and kept for the life of the process.
+    fastapi-mail builds a new jinja Environment for every message, so every send reads
+    and compiles the template from disk again.
+    """
+
+    def __init__(self, folder: Path):
+        # templates do not change while the process runs, so jinja never has to stat the files again
+        self.environment = Environment(loader=FileSystemLoader(folder), autoescape=select_autoescape(),
+                                       auto_reload=False, cache_size=-1)
+        self._templates: dict[str, Template] = {}
+
+    def compile(self) -> list[str]:
+        """
+        The compile function compiles every template of the folder, call it once at startup.
+
+        :return: The names of the compiled templates
+        """
+        for name in self.environment.list_templates(extensions=["html"]):
+            self.get(name)
+        return list(self._templates)
+
+    def get(self, name: str) -> Template:
+        template = self._templates.get(name)
+        if template is None:
+            template = self._templates[name] = self.environment.get_template(name)
+        return template
+
+    def render(self, name: str, context: dict) -> str:
+        return self.get(name).render(context)
+
+    def render_many(self, name: str, contexts: Iterable[dict]) -> list[str]:
+        """
+        The render_many function renders one template for many messages,
+        looking the compiled template up once for the whole batch.
+
+        :param name: str: The name of the template
+        :param contexts: Iterable[dict]: The variables of every message
+        :return: The rendered bodies in the order of contexts
+        """
+        template = self.get(name)
+        return [template.render(context) for context in contexts]
+
+
+renderer = TemplateRenderer(TEMPLATE_FOLDER)
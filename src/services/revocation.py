@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.services.cache import redis_client
+
+logger = logging.getLogger(__name__)
+
+REVOKED_KEY = "revoked:jti:{jti}"
+# every revoked jti scored by the expiry of its token, read by the workers to build their bloom filters
+REVOKED_SET = "revoked:jtis"
+
+
+class BloomFilter:
+    """
+    Set membership with false positives but without false negatives, in a fixed number of bits.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # two 64-bit halves of one digest generate all positions (Kirsch-Mitzenmacher)
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    Revoked access tokens, identified by their jti.
+    Redis holds one key per revoked token that expires with the token. Every worker keeps a bloom filter
+    of the revoked jtis, rebuilt from redis every refresh_interval seconds, and asks redis only about
+    tokens the filter reports as revoked, so a request with a valid token makes no redis call.
+    A token revoked by another worker is rejected here after the next refresh at the latest.
+    """
+
+    def __init__(self, refresh_interval: float, capacity: int, error_rate: float):
+        self.refresh_interval = refresh_interval
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(capacity, error_rate)
+        self._recent: set[str] = set()
+        self._task: asyncio.Task | None = None
+
+    async def revoke(self, jti: str, expires_at: float) -> None:
+        """
+        The revoke function revokes a token until it expires. The key of the token and its entry in
+        the set the workers refresh from are written in one MULTI/EXEC, so a token is never revoked
+        in redis without reaching the bloom filters.
+
+        :param jti: str: The id of the token
+        :param expires_at: float: The exp claim of the token
+        :return: None
+        """
+        ttl = math.ceil(expires_at - time.time())
+        if ttl <= 0:
+            return
+        # added first, the transaction may have been applied even if its reply was lost
+        self.bloom.add(jti)
+        self._recent.add(jti)
+        await (redis_client.pipeline(transaction=True)
+               .set(REVOKED_KEY.format(jti=jti), 1, ex=ttl)
+               .zadd(REVOKED_SET, {jti: expires_at})
+               .execute())
+
+    async def is_revoked(self, jti: str | None) -> bool:
+        """
+        The is_revoked function checks a token against the bloom filter and, if the filter
+        reports it as revoked, against redis. If redis cannot confirm a possible revocation
+        the token is treated as revoked.
+
+        :param jti: str | None: The id of the token, tokens issued without one cannot be revoked
+        :return: True if the token was revoked
+        """
+        if jti is None or jti not in self.bloom:
+            return False
+        try:
+            return bool(await redis_client.exists(REVOKED_KEY.format(jti=jti)))
+        except RedisError as err:
+            logger.warning("Revocation check failed: %s", err)
+            return True
+
+    async def refresh(self) -> int:
+        """
+        The refresh function rebuilds the bloom filter from the revoked tokens that have not expired yet.
+
+        :return: Number of revoked tokens in the filter
+        """
+        now = time.time()
+        # jtis revoked by this worker after this point may be missing from the redis read
+        self._recent = set()
+        await redis_client.zremrangebyscore(REVOKED_SET, "-inf", now)
+        jtis = await redis_client.zrangebyscore(REVOKED_SET, now, "+inf")
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti.decode() if isinstance(jti, bytes) else jti)
+        for jti in self._recent:
+            bloom.add(jti)
+        self.bloom = bloom
+        return len(jtis)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except RedisError as err:
+                logger.warning("Revocation list refresh failed: %s", err)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+revocation_list = RevocationList(refresh_interval=settings.revocation_refresh_interval,
+                                 capacity=settings.revocation_bloom_capacity,
+                                 error_rate=settings.revocation_bloom_error_rate)
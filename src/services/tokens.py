@@ -0,0 +1,102 @@
+import hashlib
+import time
+
+from jose import JWTError, jwk, jwt as jose_jwt
+
+from src.conf.config import settings
+from src.services.cache import LRUCache
+
+try:
+    import jwt as pyjwt
+except ImportError:
+    pyjwt = None
+
+
+class TokenError(Exception):
+    """
+    The token is malformed, has an invalid signature or has expired.
+    """
+
+
+class JoseBackend:
+    """
+    python-jose with the key object built once. Given the secret as a string, jose tries to parse
+    it as a JWK json document and constructs a new key object for every call.
+    """
+
+    def __init__(self, secret: str, algorithm: str):
+        self.algorithm = algorithm
+        self.key = jwk.construct(secret, algorithm)
+
+    def encode(self, claims: dict) -> str:
+        return jose_jwt.encode(claims, self.key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return jose_jwt.decode(token, self.key, algorithms=[self.algorithm])
+        except JWTError as err:
+            raise TokenError(str(err)) from err
+
+
+class PyJWTBackend:
+    """
+    PyJWT, a faster implementation of the same tokens. It is an optional dependency.
+    """
+
+    def __init__(self, secret: str, algorithm: str):
+        if pyjwt is None:
+            raise RuntimeError("jwt_backend is pyjwt but PyJWT is not installed")
+        self.algorithm = algorithm
+        self.key = pyjwt.get_algorithm_by_name(algorithm).prepare_key(secret)
+        self.algorithms = [algorithm]
+
+    def encode(self, claims: dict) -> str:
+        return pyjwt.encode(claims, self.key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        try:
+            return pyjwt.decode(token, self.key, algorithms=self.algorithms)
+        except pyjwt.PyJWTError as err:
+            raise TokenError(str(err)) from err
+
+
+JWT_BACKENDS = {
+    "jose": JoseBackend,
+    "pyjwt": PyJWTBackend,
+}
+
+
+class TokenVerifier:
+    """
+    Encodes and decodes tokens and keeps the claims of verified tokens in an in-process LRU cache.
+    Entries are keyed by the sha256 of the token, so the cache holds no usable tokens,
+    and expire when the token does, so an expired token is never accepted from the cache.
+    """
+
+    def __init__(self, backend, maxsize: int, ttl: float):
+        self.backend = backend
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def encode(self, claims: dict) -> str:
+        return self.backend.encode(claims)
+
+    def decode(self, token: str) -> dict:
+        """
+        The decode function returns the claims of a token, verifying its signature and expiry
+        only the first time the token is seen. The returned dictionary must not be modified.
+
+        :param token: str: The encoded token
+        :return: The claims of the token
+        """
+        key = hashlib.sha256(token.encode()).digest()
+        claims = self.cache.get(key)
+        if claims is None:
+            claims = self.backend.decode(token)
+            ttl = claims["exp"] - time.time() if "exp" in claims else None
+            self.cache.set(key, claims, ttl)
+        return claims
+
+
+def create_verifier() -> TokenVerifier:
+    backend = JWT_BACKENDS[settings.jwt_backend](settings.secret_key_jwt, settings.algorithm)
+    return TokenVerifier(backend, maxsize=settings.token_cache_size, ttl=settings.token_cache_ttl)
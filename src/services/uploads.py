@@ -0,0 +1,64 @@
+from fastapi import HTTPException, Request, UploadFile, status
+
+from src.services.metrics import InstrumentedRoute
+from src.conf.config import settings
+
+# room for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def too_large(limit: int) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                         detail=f"File is larger than {limit} bytes")
+
+
+class LimitedBodyRoute(InstrumentedRoute):
+    """
+    Route that stops reading the request body as soon as it grows over max_body_size bytes.
+    FastAPI parses a multipart body into temporary files before the endpoint runs, so without
+    the limit a client could make the server spool a body of any size.
+    """
+
+    max_body_size = settings.avatar_max_bytes + MULTIPART_OVERHEAD
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        max_body_size = self.max_body_size
+
+        async def limited_handler(request: Request):
+            content_length = request.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > max_body_size:
+                raise too_large(max_body_size)
+            receive = request.receive
+            received = 0
+
+            async def limited_receive():
+                nonlocal received
+                message = await receive()
+                received += len(message.get("body", b""))
+                if received > max_body_size:
+                    raise too_large(max_body_size)
+                return message
+
+            return await handler(Request(request.scope, limited_receive))
+
+        return limited_handler
+
+
+async def read_upload(file: UploadFile, limit: int, chunk_size: int = 64 * 1024) -> bytes:
+    """
+    The read_upload function reads an uploaded file in chunks and fails with 413
+    as soon as it is larger than limit bytes.
+
+    :param file: UploadFile: The uploaded file
+    :param limit: int: Maximum size of the file in bytes
+    :param chunk_size: int: Number of bytes read at once
+    :return: The content of the file
+    """
+    chunks, size = [], 0
+    while chunk := await file.read(chunk_size):
+        size += len(chunk)
+        if size > limit:
+            raise too_large(limit)
+        chunks.append(chunk)
+    return b"".join(chunks)
@@ -1,21 +1,68 @@
+import os
+
+# count and fingerprint the queries of every request, see query_budget
+os.environ.setdefault("QUERY_DEBUG", "true")
+os.environ.setdefault("INTERNAL_TOKEN", "internal-test-token")
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 
 from main import app
 from src.database.models import Base
 from src.database.connect import get_db
+from src.services.metrics import instrument_engine
+from src.services.querylog import instrument_queries, query_listeners
+from src.conf.config import settings
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+SQLALCHEMY_ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient runs every request in its own event loop, so connections must not be pooled between requests
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL, poolclass=NullPool)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+instrument_engine(async_engine.sync_engine)
+instrument_queries(async_engine.sync_engine, settings.slow_query_threshold)
+
+# most queries a request to every route may send, a route without a budget fails the tests that call it
+QUERY_BUDGETS = {
+    "POST /auth/signup": 3,
+    "POST /auth/login": 2,
+    "GET /auth/refresh_token": 2,
+    "POST /auth/logout": 2,
+    "GET /auth/confirmed_email/{token}": 2,
+    "POST /auth/request_email": 2,
+    "GET /contacts/": 2,
+    "GET /contacts/export": 1,
+    "GET /contacts/changes": 2,
+    "GET /contacts/{contact_id}": 2,
+    "GET /contacts/find/": 1,
+    "GET /contacts/birthday/": 1,
+    "POST /contacts/create": 2,
+    "POST /contacts/import": 4,
+    "POST /contacts/batch": 6,
+    "PUT /contacts/{contact_id}": 3,
+    "DELETE /contacts/{contact_id}": 4,
+    "GET /api/users/me/": 1,
+    "PATCH /api/users/avatar": 2,
+    "GET /internal/pool": 0,
+    "GET /internal/caches": 0,
+    "GET /internal/outbox": 1,
+    "GET /internal/metrics": 0,
+    "GET /api/healthchecker": 1,
+    "GET /health/live": 0,
+    "GET /health/ready": 0,
+}
+
 
 @pytest.fixture(scope="module")
 def session():
@@ -35,17 +82,62 @@ def session():
 def client(session):
     # Dependency override
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with AsyncTestingSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
 
     yield TestClient(app)
 
 
+@pytest.fixture(scope="module")
+def async_session_maker(session):
+    return AsyncTestingSessionLocal
+
+
+@pytest.fixture
+def sql_log():
+    # Statements and parameters sent to the database by the application while the test runs
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
 @pytest.fixture(scope="module")
 def user():
-    return {"username": "test_user", "email": "test_username1234@example.com", "password": "123456789"}
\ No newline at end of file
+    return {"username": "test_user", "email": "test_username1234@example.com", "password": "123456789"}
+
+
+@pytest.fixture
+def internal_headers():
+    return {"Authorization": f"Bearer {settings.internal_token}"}
+
+
+@pytest.fixture(autouse=True)
+def query_budget():
+    # Fails the test if a request sent more queries than the budget of its route
+
+    exceeded = []
+
+    def check(method, route, log):
+        if route == "unmatched":
+            return
+        budget = QUERY_BUDGETS.get(f"{method} {route}")
+        if budget is None:
+            exceeded.append(f"{method} {route} has no query budget, sent {log.statements} queries")
+        elif log.statements > budget:
+            repeated = "".join(f"\n    {count} x {statement}" for statement, count in log.counts.most_common())
+            exceeded.append(f"{method} {route} sent {log.statements} queries, its budget is {budget}:{repeated}")
+
+    query_listeners.append(check)
+    yield
+    query_listeners.remove(check)
+    if exceeded:
+        pytest.fail("\n".join(exceeded), pytrace=False)
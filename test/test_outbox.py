@@ -0,0 +1,149 @@
+import asyncio
+from email import message_from_bytes, policy
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import select, delete
+
+from src.conf.config import settings
+from src.database.models import EmailOutbox
+from src.repository.outbox import enqueue_email, outbox_depth
+from src.services.outbox import OutboxWorker, retry_delay
+
+SMTP_PORT = 8025
+
+
+class Handler:
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        if session not in self.sessions:
+            self.sessions.append(session)
+        return "250 OK"
+
+
+@pytest.fixture(autouse=True)
+def mail_settings(session):
+    session.execute(delete(EmailOutbox))
+    session.commit()
+    with patch.multiple(settings, mail_server="127.0.0.1", mail_port=SMTP_PORT, mail_ssl_tls=False,
+                        mail_starttls=False, mail_use_credentials=False):
+        yield
+
+
+@pytest.fixture
+def smtp_server():
+    handler = Handler()
+    controller = Controller(handler, hostname="127.0.0.1", port=SMTP_PORT)
+    controller.start()
+    yield handler
+    controller.stop()
+
+
+def run(async_session_maker, coroutine_function):
+    async def call():
+        async with async_session_maker() as db:
+            return await coroutine_function(db)
+    return asyncio.run(call())
+
+
+def enqueue(async_session_maker, count):
+    async def call(db):
+        for i in range(count):
+            await enqueue_email(f"user{i}@example.com", "Confirm your email ", "email_template.html",
+                                {"host": "http://testserver/", "username": f"user{i}", "token": "token"}, db)
+    run(async_session_maker, call)
+
+
+def test_worker_sends_batches_over_one_connection(async_session_maker, smtp_server):
+    enqueue(async_session_maker, 5)
+    worker = OutboxWorker(async_session_maker, batch_size=3)
+
+    async def drain():
+        processed = [await worker.run_once(), await worker.run_once(), await worker.run_once()]
+        await worker.close()
+        return processed
+
+    assert asyncio.run(drain()) == [3, 2, 0]
+    assert [envelope.rcpt_tos for envelope in smtp_server.messages] == [[f"user{i}@example.com"] for i in range(5)]
+    message = message_from_bytes(smtp_server.messages[0].content, policy=policy.default)
+    assert message["Subject"].strip() == "Confirm your email"
+    assert "auth/confirmed_email/token" in message.get_content()
+    assert worker.connections == 1
+    assert len(smtp_server.sessions) == 1
+    assert run(async_session_maker, outbox_depth) == {"pending": 0, "failed": 0}
+
+
+def test_worker_retries_with_backoff(async_session_maker):
+    enqueue(async_session_maker, 1)
+    worker = OutboxWorker(async_session_maker, max_attempts=2)
+
+    assert asyncio.run(worker.run_once()) == 1
+    email = run(async_session_maker, lambda db: db.scalar(select(EmailOutbox)))
+    assert email.attempts == 1
+    assert email.last_error
+    assert email.next_attempt_at > datetime.utcnow() + timedelta(seconds=settings.outbox_retry_base - 5)
+    assert asyncio.run(worker.run_once()) == 0
+
+    with patch("src.repository.outbox.datetime") as clock:
+        clock.utcnow.return_value = email.next_attempt_at
+        assert asyncio.run(worker.run_once()) == 1
+    assert run(async_session_maker, outbox_depth) == {"pending": 0, "failed": 1}
+
+
+def test_worker_marks_unrenderable_emails_failed(async_session_maker, smtp_server):
+    enqueue(async_session_maker, 2)
+
+    async def break_emails(db):
+        first, second = (await db.scalars(select(EmailOutbox).order_by(EmailOutbox.id))).all()
+        first.template_name = "missing_template.html"
+        second.template_body = "not json"
+        await db.commit()
+    run(async_session_maker, break_emails)
+    enqueue(async_session_maker, 1)
+
+    assert asyncio.run(OutboxWorker(async_session_maker).run_once()) == 3
+    assert len(smtp_server.messages) == 1
+    assert run(async_session_maker, outbox_depth) == {"pending": 0, "failed": 2}
+    errors = run(async_session_maker, lambda db: db.scalars(select(EmailOutbox.last_error).order_by(EmailOutbox.id)))
+    assert [error.split(":")[1].strip() for error in errors.all()] == ["TemplateNotFound", "JSONDecodeError"]
+
+
+def test_worker_survives_failed_batches(async_session_maker):
+    worker = OutboxWorker(async_session_maker)
+    calls = []
+
+    async def run_once():
+        calls.append(len(calls))
+        if len(calls) < 3:
+            raise OSError("database is down")
+        raise asyncio.CancelledError
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    delays = []
+    with patch.object(worker, "run_once", run_once), patch("src.services.outbox.asyncio.sleep", sleep):
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(worker.run())
+    assert len(calls) == 3
+    assert delays == [retry_delay(1), retry_delay(2)]
+
+
+def test_retry_delay():
+    assert retry_delay(1) == settings.outbox_retry_base
+    assert retry_delay(3) == settings.outbox_retry_base * 4
+    assert retry_delay(100) == settings.outbox_retry_max
+
+
+def test_outbox_stats(client, async_session_maker, internal_headers):
+    enqueue(async_session_maker, 2)
+    response = client.get("internal/outbox", headers=internal_headers)
+    assert response.status_code == 200, response.text
+    assert response.json() == {"pending": 2, "failed": 0}
@@ -0,0 +1,104 @@
+"""
+Query plan regression tests: every repository query has to find the rows of one user through an index.
+
+The database is seeded with many users so the planner has a reason to prefer the indexes, then every
+statement a repository function sends is explained with EXPLAIN QUERY PLAN and must not contain a full
+scan of the contacts table.
+"""
+import asyncio
+import re
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import insert, text
+
+from src.database.models import Contact, User
+from src.repository import contacts as contact_repository
+from src.schemas import ContactModel
+
+USERS = 50
+CONTACTS_PER_USER = 400
+FULL_SCAN = re.compile(r"^SCAN contacts\b(?!_fts)")
+
+
+@pytest.fixture(scope="module")
+def tenant(session):
+    session.execute(insert(User), [{"id": i, "username": f"plan_user{i}", "email": f"plan_user{i}@example.com",
+                                    "password": "hash", "confirmed": True} for i in range(1, USERS + 1)])
+    start = date(1970, 1, 1)
+    session.execute(insert(Contact), [
+        {"first_name": f"first{n}", "second_name": f"second{n % 997}", "email": f"contact{n}@example.com",
+         "phone_number": f"{380500000000 + n}", "birthday": start + timedelta(days=n % 10000),
+         "user_id": 1 + n % USERS}
+        for n in range(USERS * CONTACTS_PER_USER)
+    ])
+    session.commit()
+    session.execute(text("ANALYZE"))
+    return session.get(User, 1)
+
+
+def plans(session, sql_log) -> dict:
+    result = {}
+    for statement, parameters in sql_log:
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            rows = session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            result[statement] = [row[3] for row in rows]
+    return result
+
+
+def assert_index_only(session, sql_log):
+    explained = plans(session, sql_log)
+    assert explained, "no statements were captured"
+    for statement, plan in explained.items():
+        scans = [line for line in plan if FULL_SCAN.match(line)]
+        assert not scans, f"full scan of contacts in\n{statement}\nplan: {plan}"
+
+
+def run(coroutine_function, async_session_maker, *args, **kwargs):
+    async def call():
+        async with async_session_maker() as db:
+            return await coroutine_function(*args, db=db, **kwargs)
+    return asyncio.run(call())
+
+
+@pytest.mark.parametrize("call", [
+    pytest.param(lambda user: (contact_repository.get_contacts, (user,), {"limit": 50}), id="get_contacts"),
+    pytest.param(lambda user: (contact_repository.get_contacts, (user,), {"limit": 50, "after_id": 5000}),
+                 id="get_contacts_after"),
+    pytest.param(lambda user: (contact_repository.get_contact, (user, 101), {}), id="get_contact"),
+    pytest.param(lambda user: (contact_repository.get_contacts_version, (user,), {}), id="get_contacts_version"),
+    pytest.param(lambda user: (contact_repository.get_contact_changes, (user,), {"since": 10}),
+                 id="get_contact_changes"),
+    pytest.param(lambda user: (contact_repository.get_contact_by_query, (user, None, "second5", None), {}),
+                 id="get_contact_by_second_name"),
+    pytest.param(lambda user: (contact_repository.get_contact_by_query, (user, None, None, "contact5@example.com"),
+                               {}), id="get_contact_by_email"),
+    pytest.param(lambda user: (contact_repository.search_contacts, (user, "second12"), {}), id="search_contacts"),
+    pytest.param(lambda user: (contact_repository.get_nearest_birthday, (user,), {"today": date(2023, 6, 1)}),
+                 id="get_nearest_birthday"),
+    pytest.param(lambda user: (contact_repository.get_nearest_birthday, (user,), {"today": date(2023, 12, 28)}),
+                 id="get_nearest_birthday_new_year"),
+])
+def test_repository_query_uses_index(call, tenant, session, async_session_maker, sql_log):
+    function, args, kwargs = call(tenant)
+    run(function, async_session_maker, *args, **kwargs)
+    assert_index_only(session, sql_log)
+
+
+def test_stream_contacts_uses_index(tenant, session, async_session_maker, sql_log):
+    async def stream():
+        async with async_session_maker() as db:
+            return [row async for row in contact_repository.stream_contacts(tenant, db)]
+
+    assert len(asyncio.run(stream())) == CONTACTS_PER_USER
+    assert_index_only(session, sql_log)
+
+
+def test_write_queries_use_index(tenant, session, async_session_maker, sql_log):
+    body = ContactModel(first_name="planned", second_name="contact", email="planned@example.com",
+                        phone_number="380991112233", birthday=date(1990, 5, 17))
+    contact = run(contact_repository.create_contact, async_session_maker, body, tenant)
+    run(contact_repository.patch_contact, async_session_maker, body, tenant, contact.id)
+    run(contact_repository.import_contacts, async_session_maker, [(2, body)], tenant)
+    run(contact_repository.delete_contact, async_session_maker, contact.id, tenant)
+    assert_index_only(session, sql_log)
@@ -1,10 +1,10 @@
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 from src.database.models import User
 
 
 def test_create_user(client, user, monkeypatch):
-    mock_send_email = MagicMock()
+    mock_send_email = AsyncMock()
     monkeypatch.setattr("src.routes.auth.send_email", mock_send_email)
     response = client.post(
         "auth/signup",
@@ -50,6 +50,31 @@ def test_login_user(client, session, user):
     assert data["token_type"] == "bearer"
 
 
+def test_logout(client, user, monkeypatch):
+    response = client.post(
+        "auth/login",
+        data={"username": user.get('username'), "password": user.get('password')},
+    )
+    access_token = response.json()["access_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+    redis = AsyncMock()
+    pipeline = MagicMock()
+    pipeline.set.return_value = pipeline.zadd.return_value = pipeline
+    pipeline.execute = AsyncMock(return_value=[True, 1])
+    redis.pipeline = MagicMock(return_value=pipeline)
+    monkeypatch.setattr("src.services.revocation.redis_client", redis)
+    response = client.get("api/users/me/", headers=headers)
+    assert response.status_code == 200, response.text
+    redis.exists.assert_not_awaited()
+
+    response = client.post("auth/logout", headers=headers)
+    assert response.status_code == 204, response.text
+    pipeline.execute.assert_awaited_once()
+    redis.exists.return_value = 1
+    response = client.get("api/users/me/", headers=headers)
+    assert response.status_code == 401, response.text
+
+
 def test_login_wrong_password(client, user):
     response = client.post(
         "auth/login",
@@ -0,0 +1,341 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from main import app
+from src.database.models import Contact, User
+from src.repository import contacts as contact_repository
+from src.schemas import ContactModel
+from src.services.auth import auth_service
+
+
+@pytest.fixture(scope="module")
+def current_user(client, session):
+    current_user = User(username="contacts_user", email="contacts_user@example.com", password="hash", confirmed=True)
+    session.add(current_user)
+    session.commit()
+    session.add_all([Contact(first_name=f"first{i}", second_name=f"second{i}", email=f"contact{i}@example.com",
+                             phone_number=f"38050000{i:04d}", birthday=date(1990, 1, 1 + i % 28),
+                             user_id=current_user.id)
+                     for i in range(7)])
+    session.commit()
+    session.refresh(current_user)
+    session.expunge(current_user)
+
+    app.dependency_overrides[auth_service.get_current_user] = lambda: current_user
+    yield current_user
+    app.dependency_overrides.pop(auth_service.get_current_user)
+
+
+def test_get_contacts(client, current_user):
+    response = client.get("contacts/")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert len(data["items"]) == 7
+    assert data["next_cursor"] is None
+
+
+def test_get_contacts_pages(client, current_user):
+    ids = []
+    cursor = None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("contacts/", params=params)
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert len(data["items"]) <= 3
+        ids.extend(item["id"] for item in data["items"])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            break
+    assert len(ids) == 7
+    assert ids == sorted(ids)
+
+
+def test_get_contacts_invalid_cursor(client, current_user):
+    response = client.get("contacts/", params={"cursor": "not a cursor"})
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_export_contacts_ndjson(client, current_user):
+    response = client.get("contacts/export")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 7
+    assert lines[0]["email"] == "contact0@example.com"
+    assert lines[0]["birthday"] == "1990-01-01"
+
+
+def test_export_contacts_csv(client, current_user):
+    response = client.get("contacts/export", params={"format": "csv"})
+    assert response.status_code == 200, response.text
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "first_name", "second_name", "email", "phone_number", "birthday", "additional_info"]
+    assert len(rows) == 8
+
+
+def test_export_contacts_wrong_format(client, current_user):
+    response = client.get("contacts/export", params={"format": "xml"})
+    assert response.status_code == 422, response.text
+
+
+def test_import_contacts(client, current_user):
+    content = "\n".join([
+        "first_name,second_name,email,phone_number,birthday,additional_info",
+        "imported,contact,imported1@example.com,380670000001,1991-02-03,",
+        "imported,contact,imported2@example.com,380670000002,1991-02-04,friend",
+        "imported,contact,contact0@example.com,380670000003,1991-02-05,",
+        "imported,contact,imported4@example.com,380670000001,1991-02-06,",
+        "imported,contact,not an email,380670000005,1991-02-07,",
+    ])
+    response = client.post("contacts/import", files={"file": ("contacts.csv", content, "text/csv")})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["imported"] == 2
+    assert [error["row"] for error in data["failed"]] == [4, 5, 6]
+    assert "contact0@example.com" in data["failed"][0]["error"]
+    assert "380670000001" in data["failed"][1]["error"]
+    assert data["failed"][2]["error"].startswith("email")
+
+    response = client.get("contacts/", params={"limit": 500})
+    emails = [item["email"] for item in response.json()["items"]]
+    assert "imported1@example.com" in emails
+    assert "imported2@example.com" in emails
+
+
+def test_import_contacts_missing_columns(client, current_user):
+    content = "first_name,second_name,email\nimported,contact,imported9@example.com"
+    response = client.post("contacts/import", files={"file": ("contacts.csv", content, "text/csv")})
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == "Missing columns: phone_number, birthday"
+
+
+def test_import_contacts_malformed_rows(client, current_user):
+    content = "\n".join([
+        "first_name,second_name,email,phone_number,birthday",
+        "imported,contact,imported11@example.com,380670000011,1991-02-03,extra",
+        "imported,contact,imported12@example.com",
+        "imported,contact,imported13@example.com,380670000013,1991-02-05",
+    ])
+    response = client.post("contacts/import", files={"file": ("contacts.csv", content, "text/csv")})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["imported"] == 1
+    assert [error["row"] for error in data["failed"]] == [2, 3]
+    assert data["failed"][0]["error"] == "More fields than columns in the header"
+
+
+def test_import_contacts_not_utf8(client, current_user):
+    content = "first_name,second_name,email,phone_number,birthday\n" \
+              "imported,contact,imported14@example.com,380670000014,1991-02-03\n".encode() + \
+              "Jos\xe9,contact,imported15@example.com,380670000015,1991-02-03\n".encode("latin-1")
+    response = client.post("contacts/import", files={"file": ("contacts.csv", content, "text/csv")})
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == "The file is not utf-8 encoded"
+    response = client.get("contacts/", params={"limit": 500})
+    assert "imported14@example.com" not in [item["email"] for item in response.json()["items"]]
+
+
+def test_get_nearest_birthday(client, session, current_user):
+    today = date.today()
+    session.add_all([
+        Contact(first_name="birthday", second_name="soon", email="birthday_soon@example.com",
+                phone_number="380990000001", birthday=(today + timedelta(days=3)).replace(year=1988),
+                user_id=current_user.id),
+        Contact(first_name="birthday", second_name="today", email="birthday_today@example.com",
+                phone_number="380990000002", birthday=today.replace(year=1980), user_id=current_user.id),
+    ])
+    session.commit()
+    response = client.get("contacts/birthday/", params={"days": 3})
+    assert response.status_code == 200, response.text
+    emails = [contact["email"] for contact in response.json()]
+    assert emails[:2] == ["birthday_today@example.com", "birthday_soon@example.com"]
+    response = client.get("contacts/birthday/", params={"days": 0})
+    assert "birthday_soon@example.com" not in [contact["email"] for contact in response.json()]
+
+
+def test_get_nearest_birthday_new_year(async_session_maker, current_user):
+    async def nearest_birthday():
+        async with async_session_maker() as db:
+            return await contact_repository.get_nearest_birthday(current_user, db, days=7, today=date(2023, 12, 28))
+
+    contacts = asyncio.run(nearest_birthday())
+    assert [contact.email for contact in contacts][:4] == [f"contact{i}@example.com" for i in range(4)]
+    assert all(contact.birthday.month == 1 and contact.birthday.day <= 4 for contact in contacts)
+
+
+def test_search_contacts(client, current_user):
+    response = client.get("contacts/find/", params={"q": "IMPORTED2"})
+    assert response.status_code == 200, response.text
+    assert [contact["email"] for contact in response.json()] == ["imported2@example.com"]
+
+    response = client.get("contacts/find/", params={"q": "second", "limit": 2, "offset": 1})
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 2
+
+
+def test_search_contacts_short_query(client, current_user):
+    response = client.get("contacts/find/", params={"q": "t1"})
+    assert response.status_code == 200, response.text
+    assert {contact["email"] for contact in response.json()} == {"contact1@example.com"}
+
+
+def test_search_contacts_after_update(client, session, current_user):
+    contact = session.query(Contact).filter_by(email="contact6@example.com").first()
+    contact.second_name = "Renamed"
+    session.commit()
+    response = client.get("contacts/find/", params={"q": "renamed"})
+    assert [contact["email"] for contact in response.json()] == ["contact6@example.com"]
+    response = client.get("contacts/find/", params={"q": "second6"})
+    assert response.json() == []
+
+
+def test_find_contact_by_all_fields(client, current_user):
+    response = client.get("contacts/find/", params={"contact_first_name": "first1", "contact_second_name": "second2"})
+    assert response.status_code == 200, response.text
+    assert response.json() == []
+
+
+def test_get_contacts_not_modified(client, current_user, sql_log):
+    response = client.get("contacts/")
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+    sql_log.clear()
+    response = client.get("contacts/", headers={"If-None-Match": etag})
+    assert response.status_code == 304, response.text
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    assert not any("contacts.first_name" in statement for statement, _ in sql_log)
+
+
+def test_get_contact_not_modified(client, current_user):
+    contact_id = client.get("contacts/").json()["items"][0]["id"]
+    response = client.get(f"contacts/{contact_id}")
+    assert response.status_code == 200, response.text
+    response = client.get(f"contacts/{contact_id}", headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304, response.text
+
+
+def test_etag_changes_after_update(client, current_user):
+    response = client.get("contacts/")
+    etag = response.headers["ETag"]
+    contact = response.json()["items"][1]
+    contact["additional_info"] = "changed"
+    response = client.put(f"contacts/{contact['id']}", json=contact)
+    assert response.status_code == 200, response.text
+    response = client.get("contacts/", headers={"If-None-Match": etag})
+    assert response.status_code == 200, response.text
+    assert response.headers["ETag"] != etag
+
+
+def test_etag_changes_after_delete_and_create(client, current_user):
+    response = client.get("contacts/", params={"limit": 500})
+    etag = response.headers["ETag"]
+    contact = response.json()["items"][-1]
+    response = client.delete(f"contacts/{contact['id']}")
+    assert response.status_code == 204, response.text
+    fields = ("first_name", "second_name", "email", "phone_number", "birthday")
+    content = ",".join(fields) + "\n" + ",".join(contact[field] for field in fields)
+    response = client.post("contacts/import", files={"file": ("contacts.csv", content, "text/csv")})
+    assert response.json()["imported"] == 1, response.text
+    response = client.get("contacts/", params={"limit": 500}, headers={"If-None-Match": etag})
+    assert response.status_code == 200, response.text
+    assert response.headers["ETag"] != etag
+
+
+def test_get_contact_changes(client, async_session_maker, current_user):
+    response = client.get("contacts/changes")
+    assert response.status_code == 200, response.text
+    cursor = response.json()["next_cursor"]
+    contact_ids = [item["id"] for item in client.get("contacts/").json()["items"]]
+    body = ContactModel(first_name="changed", second_name="contact", email="changed@example.com",
+                        phone_number="380630000001", birthday=date(1995, 5, 5))
+
+    async def change():
+        async with async_session_maker() as db:
+            created = await contact_repository.create_contact(body, current_user, db)
+            await contact_repository.patch_contact(body.copy(update={"email": "patched@example.com",
+                                                                     "phone_number": "380630000002"}),
+                                                   current_user, contact_ids[2], db)
+            await contact_repository.delete_contact(contact_ids[3], current_user, db)
+            return created.id
+
+    created_id = asyncio.run(change())
+    response = client.get("contacts/changes", params={"since": cursor})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [created_id, contact_ids[2]]
+    assert data["deleted"] == [contact_ids[3]]
+    assert data["has_more"] is False
+
+    response = client.get("contacts/changes", params={"since": cursor, "limit": 2})
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [created_id, contact_ids[2]]
+    assert data["deleted"] == []
+    assert data["has_more"] is True
+    response = client.get("contacts/changes", params={"since": data["next_cursor"]})
+    assert response.json()["deleted"] == [contact_ids[3]]
+
+    response = client.get("contacts/changes", params={"since": response.json()["next_cursor"]})
+    assert response.json()["items"] == response.json()["deleted"] == []
+
+
+def test_update_contact_second_name(client, current_user):
+    contact = client.get("contacts/").json()["items"][0]
+    contact["second_name"] = "Surname"
+    response = client.put(f"contacts/{contact['id']}", json=contact)
+    assert response.status_code == 200, response.text
+    assert client.get(f"contacts/{contact['id']}").json()["second_name"] == "Surname"
+
+
+def test_batch_contacts(client, current_user, sql_log):
+    contacts = client.get("contacts/").json()["items"]
+    first, second, third, fourth = contacts[:4]
+    first.update(second_name="Batched", email=fourth["email"])
+    second.update(second_name="Conflict", email=contacts[5]["email"])
+    operations = [
+        {"op": "delete", "id": fourth["id"]},
+        {"op": "update", "id": first["id"], "contact": first},
+        {"op": "update", "id": second["id"], "contact": second},
+        {"op": "delete", "id": third["id"]},
+        {"op": "delete", "id": third["id"]},
+        {"op": "delete", "id": 999999},
+    ]
+    sql_log.clear()
+    response = client.post("contacts/batch", json={"operations": operations})
+    assert response.status_code == 200, response.text
+    assert [result["status"] for result in response.json()] == [204, 200, 409, 204, 409, 404]
+    writes = [statement for statement, _ in sql_log if statement.lstrip().startswith(("UPDATE contacts", "DELETE"))]
+    assert len(writes) == 2
+
+    ids = [item["id"] for item in client.get("contacts/", params={"limit": 500}).json()["items"]]
+    assert third["id"] not in ids and fourth["id"] not in ids
+    updated = client.get(f"contacts/{first['id']}").json()
+    assert updated["second_name"] == "Batched"
+    assert updated["email"] == fourth["email"]
+    assert client.get(f"contacts/{second['id']}").json()["second_name"] != "Conflict"
+
+
+def test_batch_contacts_update_without_contact(client, current_user):
+    response = client.post("contacts/batch", json={"operations": [{"op": "update", "id": 1}]})
+    assert response.status_code == 422, response.text
+
+
+def test_create_contact_rate_limit(client, current_user):
+    for i in range(3):
+        body = {"first_name": "limited", "second_name": f"contact{i}", "email": f"limited{i}@example.com",
+                "phone_number": f"38099123{i:04d}", "birthday": "1990-05-05"}
+        response = client.post("contacts/create", json=body)
+        assert response.status_code == 201, response.text
+    response = client.post("contacts/create", json={**body, "email": "limited3@example.com",
+                                                    "phone_number": "380991230003"})
+    assert response.status_code == 429, response.text
+    assert int(response.headers["Retry-After"]) > 0
@@ -0,0 +1,32 @@
+import time
+
+from src.services.health import health_checker
+
+
+def test_liveness(client):
+    response = client.get("health/live")
+    assert response.status_code == 200, response.text
+    assert response.json() == {"status": "ok"}
+
+
+def test_readiness_before_first_check(client, monkeypatch):
+    monkeypatch.setattr(health_checker, "checked_at", None)
+    response = client.get("health/ready")
+    assert response.status_code == 503, response.text
+    assert response.json()["status"] == "not_ready"
+
+
+def test_readiness(client, monkeypatch, sql_log):
+    monkeypatch.setattr(health_checker, "checked_at", time.monotonic())
+    monkeypatch.setattr(health_checker, "results", {"db": {"ok": True}, "redis": {"ok": False}})
+    response = client.get("health/ready")
+    assert response.status_code == 200, response.text
+    assert response.json()["checks"]["redis"] == {"ok": False}
+    assert sql_log == []
+
+
+def test_readiness_database_down(client, monkeypatch):
+    monkeypatch.setattr(health_checker, "checked_at", time.monotonic())
+    monkeypatch.setattr(health_checker, "results", {"db": {"ok": False}, "redis": {"ok": True}})
+    response = client.get("health/ready")
+    assert response.status_code == 503, response.text
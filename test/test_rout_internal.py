@@ -0,0 +1,52 @@
+import pytest
+
+from src.conf.config import settings
+
+
+def test_pool_stats(client, internal_headers):
+    response = client.get("internal/pool", headers=internal_headers)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["size"] == 5
+    assert data["checked_out"] == 0
+    assert data["wait_time"]["buckets"]["+Inf"] == data["wait_time"]["count"]
+
+
+def test_cache_stats(client, internal_headers):
+    response = client.get("internal/caches", headers=internal_headers)
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert set(data) == {"user", "token"}
+    assert set(data["user"]) == {"size", "maxsize", "hits", "misses"}
+
+
+def test_metrics(client, internal_headers):
+    response = client.get("api/healthchecker")
+    assert response.status_code == 200, response.text
+    response = client.get("internal/metrics", headers=internal_headers)
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "# TYPE http_request_duration_seconds histogram" in lines
+    for stage in ("total", "db", "serialization"):
+        assert any(line.startswith(f'http_request_duration_seconds_count{{method="GET",route="/api/healthchecker",'
+                                   f'stage="{stage}"}}') for line in lines), stage
+    assert 'http_request_db_queries_sum{method="GET",route="/api/healthchecker"} 1.0' in lines
+    assert any(line.startswith("db_pool_wait_seconds_count ") for line in lines)
+    assert "# TYPE cache_hits_total counter" in lines
+    for cache in ("user", "token"):
+        for name in ("cache_hits_total", "cache_misses_total", "cache_entries"):
+            assert any(line.startswith(f'{name}{{cache="{cache}"}} ') for line in lines), (name, cache)
+
+
+@pytest.mark.parametrize("headers", [{}, {"Authorization": "Bearer wrong"}, {"Authorization": "internal-test-token"}])
+def test_internal_requires_token(client, headers):
+    for path in ("pool", "caches", "outbox", "metrics"):
+        response = client.get(f"internal/{path}", headers=headers)
+        assert response.status_code == 403, (path, response.text)
+
+
+def test_internal_allowed_host(client, monkeypatch):
+    monkeypatch.setattr(settings, "internal_allowed_hosts", ["testclient"])
+    response = client.get("internal/pool")
+    assert response.status_code == 200, response.text
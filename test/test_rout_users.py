@@ -0,0 +1,71 @@
+import io
+
+import pytest
+from PIL import Image
+
+from main import app
+from src.database.models import User
+from src.services.auth import auth_service
+from src.services.avatars import LocalStorage, get_avatar_storage
+
+
+def image_bytes(width: int, height: int, image_format: str = "PNG") -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(output, image_format)
+    return output.getvalue()
+
+
+@pytest.fixture(scope="module")
+def current_user(client, session):
+    current_user = User(username="avatar_user", email="avatar_user@example.com", password="hash", confirmed=True)
+    session.add(current_user)
+    session.commit()
+    session.refresh(current_user)
+    session.expunge(current_user)
+
+    app.dependency_overrides[auth_service.get_current_user] = lambda: current_user
+    yield current_user
+    app.dependency_overrides.pop(auth_service.get_current_user)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage(tmp_path, "/media/avatars")
+    app.dependency_overrides[get_avatar_storage] = lambda: storage
+    yield storage
+    app.dependency_overrides.pop(get_avatar_storage)
+
+
+def test_update_avatar(client, current_user, storage):
+    response = client.patch("api/users/avatar", files={"file": ("avatar.png", image_bytes(800, 400), "image/png")})
+    assert response.status_code == 200, response.text
+    assert response.json()["avatar"].startswith("/media/avatars/avatar_user.jpg?v=")
+    with Image.open(storage.directory / "avatar_user.jpg") as avatar:
+        assert avatar.size == (250, 250)
+        assert avatar.format == "JPEG"
+
+
+def test_update_avatar_not_an_image(client, current_user, storage):
+    response = client.patch("api/users/avatar", files={"file": ("avatar.png", b"not an image", "image/png")})
+    assert response.status_code == 400, response.text
+
+
+def test_update_avatar_truncated_image(client, current_user, storage):
+    data = image_bytes(800, 400, "JPEG")
+    response = client.patch("api/users/avatar", files={"file": ("avatar.jpg", data[:len(data) // 2], "image/jpeg")})
+    assert response.status_code == 400, response.text
+    assert response.json()["detail"] == "File is not a supported image"
+
+
+def test_update_avatar_too_large(client, current_user, storage):
+    data = b"\0" * (6 * 1024 * 1024)
+    response = client.patch("api/users/avatar", files={"file": ("avatar.png", data, "image/png")})
+    assert response.status_code == 413, response.text
+    assert not list(storage.directory.iterdir())
+
+
+def test_update_avatar_over_file_limit(client, current_user, storage, monkeypatch):
+    monkeypatch.setattr("src.routes.users.settings.avatar_max_bytes", 1000)
+    response = client.patch("api/users/avatar", files={"file": ("avatar.png", image_bytes(400, 400), "image/png")})
+    assert response.status_code == 413, response.text
+    assert response.json()["detail"] == "File is larger than 1000 bytes"
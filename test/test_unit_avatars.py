@@ -0,0 +1,50 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image
+
+from src.services.avatars import AvatarStorage, InvalidImageError, LocalStorage, resize_avatar
+
+
+class TestAvatars(unittest.TestCase):
+
+    def test_resize_avatar(self):
+        original = io.BytesIO()
+        Image.new("RGB", (4000, 3000), "blue").save(original, "JPEG")
+        with Image.open(io.BytesIO(resize_avatar(original.getvalue()))) as avatar:
+            self.assertEqual(avatar.size, (250, 250))
+            self.assertEqual(avatar.format, "JPEG")
+
+    def test_resize_avatar_with_alpha(self):
+        original = io.BytesIO()
+        Image.new("RGBA", (100, 300)).save(original, "PNG")
+        with Image.open(io.BytesIO(resize_avatar(original.getvalue(), size=50))) as avatar:
+            self.assertEqual(avatar.size, (50, 50))
+
+    def test_resize_invalid_image(self):
+        original = io.BytesIO()
+        Image.new("RGB", (400, 300), "blue").save(original, "JPEG")
+        for data in (b"not an image", original.getvalue()[:1000]):
+            with self.assertRaises(InvalidImageError):
+                resize_avatar(data)
+
+    def test_storage_must_implement_save(self):
+        class IncompleteStorage(AvatarStorage):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteStorage()
+
+    def test_local_storage(self):
+        with tempfile.TemporaryDirectory() as directory:
+            storage = LocalStorage(directory, "/media/avatars/")
+            url = storage.save("../user", b"data")
+            self.assertTrue(url.startswith("/media/avatars/..%2Fuser.jpg?v="))
+            self.assertEqual((Path(directory) / "..%2Fuser.jpg").read_bytes(), b"data")
+            self.assertEqual([path.name for path in Path(directory).iterdir()], ["..%2Fuser.jpg"])
+
+
+if __name__ == '__main__':
+    unittest.main()
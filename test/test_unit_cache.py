@@ -0,0 +1,199 @@
+import asyncio
+import json
+import pickle
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+from redis.exceptions import ConnectionError
+
+from src.database.models import User
+from src.services.cache import (
+    LRUCache,
+    user_cache,
+    pack_user,
+    unpack_user,
+    get_cached_user,
+    set_cached_user,
+    invalidate_user,
+    SingleFlight,
+    cached_contacts,
+    invalidate_contacts
+)
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_get_missing(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.misses, 1)
+
+    def test_get_hit(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("key", "value")
+        self.assertEqual(cache.get("key"), "value")
+        self.assertEqual(cache.hits, 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_expired_entry(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        with patch("src.services.cache.monotonic", return_value=0):
+            cache.set("key", "value")
+        with patch("src.services.cache.monotonic", return_value=61):
+            self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_invalidate(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("key", "value")
+        cache.invalidate("key")
+        self.assertIsNone(cache.get("key"))
+
+
+class TestUserCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User(id=1, username="test_user", email="test@email.com", password="hash",
+                         created_at=datetime(2023, 3, 1, 12, 30), confirmed=True, avatar=None,
+                         refresh_token="token")
+
+    def test_pack_unpack_user(self):
+        result = unpack_user(pack_user(self.user))
+        self.assertEqual(result.id, self.user.id)
+        self.assertEqual(result.username, self.user.username)
+        self.assertEqual(result.email, self.user.email)
+        self.assertEqual(result.created_at, self.user.created_at)
+        self.assertTrue(result.confirmed)
+        self.assertIsNone(result.avatar)
+
+    def test_pack_user_skips_secrets(self):
+        data = pack_user(self.user)
+        self.assertNotIn(b"hash", data)
+        self.assertNotIn(b"token", data)
+
+    async def test_set_cached_user(self):
+        with patch("src.services.cache.redis_client") as redis_client:
+            redis_client.set = AsyncMock()
+            await set_cached_user(self.user)
+        redis_client.set.assert_awaited_once_with("user:v2:test_user", pack_user(self.user), ex=900)
+
+    async def test_get_cached_user(self):
+        with patch("src.services.cache.redis_client") as redis_client:
+            redis_client.get = AsyncMock(return_value=pack_user(self.user))
+            result = await get_cached_user("test_user")
+        self.assertEqual(result.email, self.user.email)
+
+    async def test_get_cached_user_undecodable(self):
+        for data in (pickle.dumps(self.user), b"{}", b"[1, 2]"):
+            with patch("src.services.cache.redis_client") as redis_client:
+                redis_client.get = AsyncMock(return_value=data)
+                with self.assertLogs("src.services.cache", level="WARNING"):
+                    result = await get_cached_user("test_user")
+            self.assertIsNone(result)
+        self.assertIsNone(user_cache.get("test_user"))
+
+    async def test_get_cached_user_from_memory(self):
+        with patch("src.services.cache.redis_client") as redis_client:
+            redis_client.set = AsyncMock()
+            redis_client.get = AsyncMock()
+            await set_cached_user(self.user)
+            result = await get_cached_user("test_user")
+        self.assertEqual(result.email, self.user.email)
+        redis_client.get.assert_not_awaited()
+
+    async def test_invalidate_user(self):
+        with patch("src.services.cache.redis_client") as redis_client:
+            redis_client.set = AsyncMock()
+            redis_client.delete = AsyncMock()
+            await set_cached_user(self.user)
+            await invalidate_user("test_user")
+        self.assertIsNone(user_cache.get("test_user"))
+        redis_client.delete.assert_awaited_once_with("user:v2:test_user")
+
+    async def test_get_cached_user_redis_unavailable(self):
+        with patch("src.services.cache.redis_client") as redis_client:
+            redis_client.get = AsyncMock(side_effect=ConnectionError())
+            result = await get_cached_user("test_user")
+        self.assertIsNone(result)
+
+
+class TestContactsCache(unittest.IsolatedAsyncioTestCase):
+
+    async def test_cached_contacts_hit(self):
+        loader = AsyncMock()
+        with patch("src.services.cache.redis_client") as redis_client:
+            redis_client.mget = AsyncMock(return_value=[b"2", json.dumps([2, {"items": []}]).encode()])
+            result = await cached_contacts(1, "list", {"limit": 10}, loader)
+        self.assertEqual(result, {"items": []})
+        redis_client.mget.assert_awaited_once_with("contacts:gen:1", "contacts:1:list:limit=10")
+        loader.assert_not_awaited()
+
+    async def test_cached_contacts_miss(self):
+        loader = AsyncMock(return_value=[{"id": 1}])
+        with patch("src.services.cache.redis_client") as redis_client:
+            redis_client.mget = AsyncMock(return_value=[None, None])
+            redis_client.set = AsyncMock()
+            result = await cached_contacts(1, "birthday", {"days": 7}, loader)
+        self.assertEqual(result, [{"id": 1}])
+        redis_client.set.assert_awaited_once_with("contacts:1:birthday:days=7", '[0,[{"id":1}]]', ex=300)
+
+    async def test_cached_contacts_stale_generation(self):
+        loader = AsyncMock(return_value={"items": [1]})
+        with patch("src.services.cache.redis_client") as redis_client:
+            redis_client.mget = AsyncMock(return_value=[b"3", json.dumps([2, {"items": []}]).encode()])
+            redis_client.set = AsyncMock()
+            result = await cached_contacts(1, "list", {"limit": 10}, loader)
+        self.assertEqual(result, {"items": [1]})
+        loader.assert_awaited_once()
+
+    async def test_cached_contacts_redis_unavailable(self):
+        loader = AsyncMock(return_value=[])
+        with patch("src.services.cache.redis_client") as redis_client:
+            redis_client.mget = AsyncMock(side_effect=ConnectionError())
+            result = await cached_contacts(1, "list", {}, loader)
+        self.assertEqual(result, [])
+        loader.assert_awaited_once()
+
+    async def test_invalidate_contacts(self):
+        with patch("src.services.cache.redis_client") as redis_client:
+            redis_client.incr = AsyncMock()
+            await invalidate_contacts(1)
+        redis_client.incr.assert_awaited_once_with("contacts:gen:1")
+
+    async def test_single_flight(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*(flight.do("key", loader) for _ in range(5)))
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(await flight.do("key", loader), 2)
+
+    async def test_single_flight_error(self):
+        flight = SingleFlight()
+        loader = AsyncMock(side_effect=ValueError())
+        with self.assertRaises(ValueError):
+            await flight.do("key", loader)
+        loader.side_effect = None
+        loader.return_value = 1
+        self.assertEqual(await flight.do("key", loader), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
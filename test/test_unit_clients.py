@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.services.clients import ClientRegistry
+
+
+class TestClientRegistry(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.registry = ClientRegistry()
+
+    def test_created_on_first_use(self):
+        factory = MagicMock()
+        client = self.registry.register("db", factory)
+        factory.assert_not_called()
+        self.assertEqual(self.registry.created(), [])
+        client.connect()
+        factory.assert_called_once_with()
+        factory.return_value.connect.assert_called_once_with()
+        self.assertEqual(self.registry.created(), ["db"])
+
+    def test_created_once(self):
+        factory = MagicMock()
+        client = self.registry.register("redis", factory)
+        client.get("key")
+        client.set("key", 1)
+        self.assertIs(self.registry.get("redis"), factory.return_value)
+        factory.assert_called_once_with()
+
+    def test_call(self):
+        client = self.registry.register("sessions", lambda: lambda value: value * 2)
+        self.assertEqual(client(21), 42)
+
+    def test_register_twice(self):
+        self.registry.register("db", MagicMock())
+        with self.assertRaises(ValueError):
+            self.registry.register("db", MagicMock())
+
+    async def test_close_in_reverse_order(self):
+        closed = []
+
+        async def close_async(client):
+            closed.append(client)
+
+        self.registry.register("first", lambda: "first", close=closed.append)
+        self.registry.register("second", lambda: "second", close=close_async)
+        self.registry.register("unused", lambda: "unused", close=closed.append)
+        self.registry.get("first")
+        self.registry.get("second")
+        await self.registry.close()
+        self.assertEqual(closed, ["second", "first"])
+        self.assertEqual(self.registry.created(), [])
+
+    async def test_close_failure(self):
+        close = MagicMock()
+        self.registry.register("first", lambda: "first", close=close)
+        self.registry.register("second", lambda: "second", close=MagicMock(side_effect=OSError("closed")))
+        self.registry.get("first")
+        self.registry.get("second")
+        with self.assertLogs("src.services.clients", level="ERROR"):
+            await self.registry.close()
+        close.assert_called_once_with("first")
+
+    def test_open_after_fork(self):
+        factory = MagicMock(side_effect=[object(), object()])
+        self.registry.register("db", factory)
+        parent = self.registry.get("db")
+        self.registry.open()
+        self.assertIs(self.registry.get("db"), parent)
+        with patch("src.services.clients.os.getpid", return_value=-1):
+            self.registry.open()
+            self.assertIsNot(self.registry.get("db"), parent)
+        self.assertEqual(factory.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,16 @@
 import unittest
-from datetime import datetime, timedelta
-from unittest.mock import MagicMock
+from datetime import date, datetime
+from unittest.mock import MagicMock, AsyncMock
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.models import Contact, User
+from src.database.models import Contact, User, birthday_doy
 from src.schemas import ContactModel
 from src.repository.contacts import (
     get_contacts,
     get_contact,
+    get_contacts_version,
+    next_change_seq,
     create_contact,
     patch_contact,
     delete_contact,
@@ -19,26 +21,37 @@ from src.repository.contacts import (
 class TestNotes(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
+        self.session.execute.return_value = MagicMock()
         self.user = User(id=1)
 
     async def test_get_contacts(self):
         contacts = [Contact(), Contact(), Contact()]
-        self.session.query().filter_by().all.return_value = contacts
+        self.session.execute.return_value.scalars().all.return_value = contacts
         result = await get_contacts(user=self.user, db=self.session)
         self.assertEqual(result, contacts)
 
     async def test_get_contact(self):
         contact = Contact()
-        self.session.query().filter_by().first.return_value = contact
+        self.session.execute.return_value.scalars().first.return_value = contact
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_get_contact_not_found(self):
-        self.session.query().filter_by().first.return_value = None
+        self.session.execute.return_value.scalars().first.return_value = None
         result = await get_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
 
+    async def test_get_contacts_version(self):
+        self.session.scalar.return_value = 7
+        result = await get_contacts_version(user=self.user, db=self.session)
+        self.assertEqual(result, 7)
+
+    async def test_next_change_seq(self):
+        self.session.execute.return_value.scalar_one.return_value = 12
+        result = await next_change_seq(user=self.user, db=self.session, count=3)
+        self.assertEqual(result, 10)
+
     async def test_create_contact(self):
         body = ContactModel(
             first_name="test",
@@ -59,12 +72,12 @@ class TestNotes(unittest.IsolatedAsyncioTestCase):
 
     async def test_remove_contact_found(self):
         contact = Contact()
-        self.session.query().filter_by().first.return_value = contact
+        self.session.execute.return_value.scalars().first.return_value = contact
         result = await delete_contact(contact_id=1, user=self.user, db=self.session)
         self.assertEqual(result, contact)
 
     async def test_remove_contact_not_found(self):
-        self.session.query().filter_by().first.return_value = None
+        self.session.execute.return_value.scalars().first.return_value = None
         result = await delete_contact(contact_id=1, user=self.user, db=self.session)
         self.assertIsNone(result)
 
@@ -78,7 +91,7 @@ class TestNotes(unittest.IsolatedAsyncioTestCase):
             additional_info="test_add_info"
         )
         contact = Contact()
-        self.session.query().filter_by().first.return_value = contact
+        self.session.execute.return_value.scalars().first.return_value = contact
         self.session.commit.return_value = None
         result = await patch_contact(contact_id=1, body=body, user=self.user, db=self.session)
         self.assertEqual(result, contact)
@@ -92,22 +105,23 @@ class TestNotes(unittest.IsolatedAsyncioTestCase):
             birthday=datetime(2020, 5, 17),
             additional_info="test_add_info"
         )
-        self.session.query().filter_by().first.return_value = None
+        self.session.execute.return_value.scalars().first.return_value = None
         self.session.commit.return_value = None
         result = await patch_contact(contact_id=1, body=body, user=self.user, db=self.session)
         self.assertIsNone(result)
 
     async def test_get_nearest_birthday(self):
-        contacts = [Contact(birthday=datetime.now() + timedelta(days=1)),
-                    Contact(birthday=datetime.now() + timedelta(days=2)),
-                    Contact(birthday=datetime.now() + timedelta(days=3)),
-                    Contact(birthday=datetime.now() + timedelta(days=6)),
-                    Contact(birthday=datetime.now() + timedelta(days=14)),
-                    ]
-        self.session.query().filter_by().all.return_value = contacts
-        result = await get_nearest_birthday(user=self.user, db=self.session)
-        self.assertEqual(result, contacts[0:4]) # тільки у 4 з 5 контактів день народження у межах 7 днів у 5 ні.
+        contacts = [Contact(birthday=date(1990, 12, 30)), Contact(birthday=date(1985, 1, 2))]
+        self.session.execute.return_value.scalars().all.return_value = contacts
+        result = await get_nearest_birthday(user=self.user, db=self.session, days=7, today=date(2023, 12, 28))
+        self.assertEqual(result, contacts)
 
+    def test_birthday_doy(self):
+        self.assertEqual(birthday_doy(date(1990, 1, 1)), 1)
+        self.assertEqual(birthday_doy(date(1992, 2, 29)), 60)
+        self.assertEqual(birthday_doy(date(1990, 3, 1)), 61)
+        self.assertEqual(birthday_doy(date(1992, 3, 1)), 61)
+        self.assertEqual(birthday_doy(date(1990, 12, 31)), 366)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from src.services.etag import make_etag, etag_matches
+
+
+class TestETag(unittest.TestCase):
+
+    def test_make_etag(self):
+        self.assertEqual(make_etag(42), 'W/"42"')
+        self.assertEqual(make_etag(0), 'W/"0"')
+
+    def test_etag_matches(self):
+        etag = make_etag(3)
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", {etag}', etag))
+        self.assertTrue(etag_matches(etag.removeprefix("W/"), etag))
+        self.assertTrue(etag_matches("*", etag))
+
+    def test_etag_does_not_match(self):
+        etag = make_etag(3)
+        self.assertFalse(etag_matches(None, etag))
+        self.assertFalse(etag_matches(make_etag(2), etag))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import unittest
+
+from fastapi import HTTPException
+
+from src.services.executors import BoundedExecutor
+
+
+def thread_name() -> str:
+    return threading.current_thread().name
+
+
+class TestBoundedExecutor(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.pool = BoundedExecutor(kind="thread", workers=1, max_pending=1, name="test")
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.shutdown()
+
+    async def test_run(self):
+        self.assertTrue((await self.pool.run(thread_name)).startswith("test"))
+        self.assertEqual(self.pool.pending, 0)
+
+    async def test_saturated_pool(self):
+        task = asyncio.create_task(self.pool.run(self.release.wait))
+        await asyncio.sleep(0)
+        with self.assertRaises(HTTPException) as err:
+            await self.pool.run(thread_name)
+        self.assertEqual(err.exception.status_code, 503)
+        self.release.set()
+        await task
+        self.assertEqual(self.pool.pending, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+
+from src.services.executors import BoundedExecutor
+from src.services.hashing import hash_password, verify_password
+
+
+class TestHashing(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.pool = BoundedExecutor(kind="thread", workers=1, max_pending=1, name="bcrypt")
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    async def test_hash_and_verify(self):
+        hashed = await self.pool.run(hash_password, "123456789")
+        self.assertTrue(await self.pool.run(verify_password, "123456789", hashed))
+        self.assertFalse(await self.pool.run(verify_password, "password", hashed))
+
+
+if __name__ == '__main__':
+    unittest.main()
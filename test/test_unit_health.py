@@ -0,0 +1,67 @@
+import asyncio
+import time
+import unittest
+
+from src.services.health import HealthChecker
+
+
+async def ok():
+    pass
+
+
+async def failing():
+    raise ConnectionRefusedError("refused")
+
+
+async def hanging():
+    await asyncio.sleep(10)
+
+
+class TestHealthChecker(unittest.IsolatedAsyncioTestCase):
+
+    def checker(self, **checks) -> HealthChecker:
+        return HealthChecker(checks, required=["db"], interval=5, timeout=0.05)
+
+    async def test_not_ready_before_first_check(self):
+        checker = self.checker(db=ok)
+        self.assertFalse(checker.ready)
+        self.assertEqual(checker.report(), {"status": "not_ready", "stale": True, "checks": {}})
+
+    async def test_ready(self):
+        checker = self.checker(db=ok, smtp=failing)
+        await checker.run_once()
+        self.assertTrue(checker.ready)
+        report = checker.report()
+        self.assertEqual(report["status"], "ready")
+        self.assertTrue(report["checks"]["db"]["ok"])
+        self.assertFalse(report["checks"]["smtp"]["ok"])
+        self.assertEqual(report["checks"]["smtp"]["error"], "ConnectionRefusedError: refused")
+
+    async def test_required_check_failed(self):
+        checker = self.checker(db=failing)
+        await checker.run_once()
+        self.assertFalse(checker.ready)
+
+    async def test_timeout(self):
+        checker = self.checker(db=hanging)
+        await checker.run_once()
+        self.assertFalse(checker.ready)
+        self.assertEqual(checker.results["db"]["error"], "TimeoutError")
+
+    async def test_stale(self):
+        checker = self.checker(db=ok)
+        await checker.run_once()
+        checker.checked_at = time.monotonic() - 16
+        self.assertTrue(checker.stale)
+        self.assertFalse(checker.ready)
+
+    async def test_background_task(self):
+        checker = self.checker(db=ok)
+        checker.start()
+        await asyncio.sleep(0.01)
+        await checker.stop()
+        self.assertTrue(checker.ready)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from src.services.metrics import Histogram, RequestMetrics, RequestTimings, current_timings, stage
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_snapshot(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["buckets"], {"0.1": 2, "1.0": 3, "+Inf": 4})
+        self.assertEqual(snapshot["count"], 4)
+        self.assertAlmostEqual(snapshot["sum"], 2.65)
+
+    def test_empty_snapshot(self):
+        snapshot = Histogram(buckets=(0.1,)).snapshot()
+        self.assertEqual(snapshot, {"buckets": {"0.1": 0, "+Inf": 0}, "count": 0, "sum": 0.0})
+
+
+class TestRequestMetrics(unittest.TestCase):
+
+    def test_stage(self):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with stage("auth"):
+                pass
+            with stage("auth"):
+                pass
+        finally:
+            current_timings.reset(token)
+        self.assertGreater(timings.stages["auth"], 0)
+        with stage("auth"):
+            pass
+
+    def test_render(self):
+        metrics = RequestMetrics()
+        timings = RequestTimings()
+        timings.stages.update({"total": 0.02, "db": 0.004})
+        timings.queries = 3
+        metrics.record("GET", "/contacts/", timings)
+        lines = metrics.render().splitlines()
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/contacts/",stage="db",le="0.005"} 1',
+                      lines)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/contacts/",stage="total",le="0.01"} 0',
+                      lines)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/contacts/",stage="total"} 1', lines)
+        self.assertIn('http_request_db_queries_bucket{method="GET",route="/contacts/",le="2"} 0', lines)
+        self.assertIn('http_request_db_queries_bucket{method="GET",route="/contacts/",le="3"} 1', lines)
+        self.assertIn('http_request_db_queries_sum{method="GET",route="/contacts/"} 3.0', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
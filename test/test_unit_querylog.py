@@ -0,0 +1,57 @@
+import unittest
+
+from sqlalchemy import create_engine, text
+
+from src.services.querylog import QueryLog, current_query_log, fingerprint, instrument_queries
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def test_parameters_and_literals(self):
+        self.assertEqual(fingerprint("SELECT * FROM users\n  WHERE users.id = $1 AND name = 'o''brien' LIMIT 10"),
+                         "SELECT * FROM users WHERE users.id = ? AND name = ? LIMIT ?")
+        self.assertEqual(fingerprint("SELECT * FROM users WHERE id = %(id_1)s"),
+                         fingerprint("SELECT * FROM users WHERE id = :id_1"))
+
+    def test_lists(self):
+        self.assertEqual(fingerprint("SELECT id FROM contacts WHERE id IN (?, ?, ?)"),
+                         fingerprint("SELECT id FROM contacts WHERE id IN (?)"))
+        self.assertEqual(fingerprint("INSERT INTO t (a, b) VALUES (?, ?), (?, ?)"),
+                         "INSERT INTO t (a, b) VALUES (?+)")
+
+    def test_identifiers_are_kept(self):
+        self.assertEqual(fingerprint("SELECT anon_1.id FROM t AS anon_1 WHERE x::text = ?"),
+                         "SELECT anon_1.id FROM t AS anon_1 WHERE x::text = ?")
+
+
+class TestQueryLog(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+
+    def test_records_the_current_request(self):
+        instrument_queries(self.engine, slow_threshold=10)
+        log = QueryLog()
+        token = current_query_log.set(log)
+        try:
+            with self.engine.connect() as conn:
+                for i in range(5):
+                    conn.execute(text("SELECT :i"), {"i": i})
+                conn.execute(text("SELECT 1, 2"))
+        finally:
+            current_query_log.reset(token)
+        self.assertEqual(log.statements, 6)
+        self.assertEqual(log.repeated(5), [("SELECT ?", 5)])
+        self.assertEqual(log.repeated(6), [])
+
+    def test_slow_query_logged_with_parameters(self):
+        instrument_queries(self.engine, slow_threshold=0)
+        with self.assertLogs("src.services.querylog", "WARNING") as logs:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT :name"), {"name": "value"})
+        self.assertIn("Slow query", logs.output[0])
+        self.assertIn("'value'", logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
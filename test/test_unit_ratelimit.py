@@ -0,0 +1,75 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.services.ratelimit import RateLimiter, parse_limit
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        patcher = patch("src.services.ratelimit.redis_client")
+        self.redis = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pipeline = MagicMock()
+        for method in ("incr", "expire", "get"):
+            getattr(self.pipeline, method).return_value = self.pipeline
+        self.pipeline.execute = AsyncMock(return_value=[1, True, None])
+        self.redis.pipeline = MagicMock(return_value=self.pipeline)
+        patcher = patch("src.services.ratelimit.settings")
+        self.settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.settings.rate_limits = {"policy": "3/60"}
+        self.settings.rate_limit_overrides = {"vip": {"policy": "100/60"}}
+
+    def test_parse_limit(self):
+        self.assertEqual(parse_limit("3/60"), (3, 60))
+
+    def test_limit_for(self):
+        limiter = RateLimiter("policy")
+        self.assertEqual(limiter.limit_for(), (3, 60))
+        self.assertEqual(limiter.limit_for("user"), (3, 60))
+        self.assertEqual(limiter.limit_for("vip"), (100, 60))
+        self.assertIsNone(RateLimiter("other").limit_for())
+
+    async def test_under_limit(self):
+        await RateLimiter("policy").check("user:1")
+        self.pipeline.execute.assert_awaited_once()
+        current_key = self.pipeline.incr.call_args.args[0]
+        self.assertTrue(current_key.startswith("ratelimit:policy:user:1:"))
+        self.pipeline.expire.assert_called_once_with(current_key, 120)
+
+    async def test_over_limit_in_redis(self):
+        self.pipeline.execute.return_value = [4, True, None]
+        with self.assertRaises(HTTPException) as err:
+            await RateLimiter("policy", local=False).check("user:1")
+        self.assertEqual(err.exception.status_code, 429)
+        self.assertIn("Retry-After", err.exception.headers)
+
+    async def test_previous_window_counts(self):
+        self.pipeline.execute.return_value = [1, True, b"100"]
+        with self.assertRaises(HTTPException):
+            await RateLimiter("policy", local=False).check("user:1")
+
+    async def test_local_bucket_rejects_without_redis(self):
+        limiter = RateLimiter("policy")
+        for _ in range(3):
+            await limiter.check("user:1")
+        with self.assertRaises(HTTPException):
+            await limiter.check("user:1")
+        self.assertEqual(self.pipeline.execute.await_count, 3)
+        await limiter.check("user:2")
+
+    async def test_redis_error_falls_back_to_local_bucket(self):
+        self.pipeline.execute.side_effect = RedisConnectionError
+        limiter = RateLimiter("policy")
+        for _ in range(3):
+            await limiter.check("user:1")
+        with self.assertRaises(HTTPException):
+            await limiter.check("user:1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from jinja2 import TemplateNotFound
+
+from src.database.models import EmailOutbox
+from src.services.email import TEMPLATE_FOLDER
+from src.services.outbox import build_messages
+from src.services.rendering import TemplateRenderer
+
+
+class TestTemplateRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.renderer = TemplateRenderer(TEMPLATE_FOLDER)
+
+    def test_compile(self):
+        self.assertIn("email_template.html", self.renderer.compile())
+
+    def test_template_is_compiled_once(self):
+        self.assertIs(self.renderer.get("email_template.html"), self.renderer.get("email_template.html"))
+
+    def test_render_many(self):
+        contexts = [{"host": "http://host", "username": name, "token": "token"} for name in ("first", "<b>")]
+        first, second = self.renderer.render_many("email_template.html", contexts)
+        self.assertIn("Hi first,", first)
+        self.assertIn("http://host/auth/confirmed_email/token", first)
+        self.assertIn("Hi &lt;b&gt;,", second)
+        self.assertEqual(self.renderer.render("email_template.html", contexts[0]), first)
+
+    def test_build_messages(self):
+        emails = [EmailOutbox(id=i, recipient=f"user{i}@example.com", subject="Confirm your email",
+                              template_name="email_template.html",
+                              template_body=f'{{"host": "http://host", "username": "user{i}", "token": "t"}}')
+                  for i in range(3)]
+        messages = build_messages(emails)
+        self.assertEqual([message["To"] for message in messages], [email.recipient for email in emails])
+        self.assertIn("Hi user2,", messages[2].get_payload(decode=True).decode())
+
+    def test_build_messages_render_error(self):
+        emails = [EmailOutbox(id=1, recipient="user1@example.com", subject="Confirm your email",
+                              template_name="missing_template.html", template_body="{}"),
+                  EmailOutbox(id=2, recipient="user2@example.com", subject="Confirm your email",
+                              template_name="email_template.html", template_body="not json"),
+                  EmailOutbox(id=3, recipient="user3@example.com", subject="Confirm your email",
+                              template_name="email_template.html",
+                              template_body='{"host": "http://host", "username": "user3", "token": "t"}')]
+        missing, invalid, message = build_messages(emails)
+        self.assertIsInstance(missing, TemplateNotFound)
+        self.assertIsInstance(invalid, ValueError)
+        self.assertEqual(message["To"], "user3@example.com")
+
+
+if __name__ == '__main__':
+    unittest.main()
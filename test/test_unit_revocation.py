@@ -0,0 +1,94 @@
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.services.revocation import REVOKED_SET, BloomFilter, RevocationList
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_added_items_are_members(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [f"jti{i}" for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"jti{i}")
+        false_positives = sum(f"other{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class TestRevocationList(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.revocations = RevocationList(refresh_interval=5, capacity=1000, error_rate=0.01)
+        patcher = patch("src.services.revocation.redis_client")
+        self.redis = patcher.start()
+        self.addCleanup(patcher.stop)
+        for method in ("exists", "zremrangebyscore", "zrangebyscore"):
+            setattr(self.redis, method, AsyncMock())
+        self.pipeline = MagicMock()
+        for method in ("set", "zadd"):
+            getattr(self.pipeline, method).return_value = self.pipeline
+        self.pipeline.execute = AsyncMock(return_value=[True, 1])
+        self.redis.pipeline = MagicMock(return_value=self.pipeline)
+
+    async def test_valid_token_skips_redis(self):
+        self.assertFalse(await self.revocations.is_revoked("jti"))
+        self.assertFalse(await self.revocations.is_revoked(None))
+        self.redis.exists.assert_not_awaited()
+
+    async def test_revoke(self):
+        expires_at = time.time() + 60
+        await self.revocations.revoke("jti", expires_at)
+        self.redis.pipeline.assert_called_once_with(transaction=True)
+        self.pipeline.set.assert_called_once_with("revoked:jti:jti", 1, ex=60)
+        self.pipeline.zadd.assert_called_once_with(REVOKED_SET, {"jti": expires_at})
+        self.pipeline.execute.assert_awaited_once()
+        self.redis.exists.return_value = 1
+        self.assertTrue(await self.revocations.is_revoked("jti"))
+        self.redis.exists.assert_awaited_once_with("revoked:jti:jti")
+
+    async def test_revoke_expired_token(self):
+        await self.revocations.revoke("jti", time.time() - 1)
+        self.redis.pipeline.assert_not_called()
+
+    async def test_revoke_redis_error(self):
+        self.pipeline.execute.side_effect = RedisConnectionError
+        with self.assertRaises(RedisConnectionError):
+            await self.revocations.revoke("jti", time.time() + 60)
+        self.redis.exists.return_value = 1
+        self.assertTrue(await self.revocations.is_revoked("jti"))
+
+    async def test_bloom_false_positive_checked_in_redis(self):
+        self.revocations.bloom.add("jti")
+        self.redis.exists.return_value = 0
+        self.assertFalse(await self.revocations.is_revoked("jti"))
+
+    async def test_redis_error_fails_closed(self):
+        self.revocations.bloom.add("jti")
+        self.redis.exists.side_effect = RedisConnectionError
+        self.assertTrue(await self.revocations.is_revoked("jti"))
+
+    async def test_refresh(self):
+        self.redis.zrangebyscore.return_value = [b"other_worker", "second"]
+        self.assertEqual(await self.revocations.refresh(), 2)
+        self.assertIn("other_worker", self.revocations.bloom)
+        self.assertIn("second", self.revocations.bloom)
+        self.redis.zremrangebyscore.assert_awaited_once()
+
+    async def test_refresh_drops_expired(self):
+        self.revocations.bloom.add("expired")
+        self.redis.zrangebyscore.return_value = []
+        await self.revocations.refresh()
+        self.assertNotIn("expired", self.revocations.bloom)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+from src.services.tokens import JoseBackend, PyJWTBackend, TokenError, TokenVerifier
+
+SECRET = "secret_key_for_the_token_tests_0123456789"
+
+
+def claims(seconds: float = 60) -> dict:
+    return {"sub": "test_user", "scope": "access_token", "iat": datetime.utcnow(),
+            "exp": datetime.utcnow() + timedelta(seconds=seconds)}
+
+
+class TestBackends(unittest.TestCase):
+
+    def test_round_trip(self):
+        for backend in (JoseBackend(SECRET, "HS256"), PyJWTBackend(SECRET, "HS256")):
+            with self.subTest(backend=type(backend).__name__):
+                self.assertEqual(backend.decode(backend.encode(claims()))["sub"], "test_user")
+
+    def test_backends_are_interchangeable(self):
+        jose, pyjwt = JoseBackend(SECRET, "HS256"), PyJWTBackend(SECRET, "HS256")
+        self.assertEqual(pyjwt.decode(jose.encode(claims()))["sub"], "test_user")
+        self.assertEqual(jose.decode(pyjwt.encode(claims()))["sub"], "test_user")
+
+    def test_invalid_tokens(self):
+        for backend in (JoseBackend(SECRET, "HS256"), PyJWTBackend(SECRET, "HS256")):
+            with self.subTest(backend=type(backend).__name__):
+                with self.assertRaises(TokenError):
+                    backend.decode(backend.encode(claims(seconds=-10)))
+                with self.assertRaises(TokenError):
+                    backend.decode(JoseBackend("other_secret", "HS256").encode(claims()))
+                with self.assertRaises(TokenError):
+                    backend.decode("not a token")
+
+
+class TestTokenVerifier(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = JoseBackend(SECRET, "HS256")
+        self.verifier = TokenVerifier(self.backend, maxsize=10, ttl=900)
+
+    def test_decode_is_cached(self):
+        token = self.verifier.encode(claims())
+        self.verifier.backend = MagicMock(wraps=self.backend)
+        first = self.verifier.decode(token)
+        second = self.verifier.decode(token)
+        self.assertIs(first, second)
+        self.verifier.backend.decode.assert_called_once_with(token)
+
+    def test_cache_entry_expires_with_token(self):
+        token = self.verifier.encode(claims(seconds=30))
+        with patch("src.services.cache.monotonic", return_value=1000):
+            self.verifier.decode(token)
+        with patch("src.services.cache.monotonic", return_value=1032):
+            self.assertIsNone(self.verifier.cache.get(next(iter(self.verifier.cache._data))))
+
+    def test_invalid_token_is_not_cached(self):
+        with self.assertRaises(TokenError):
+            self.verifier.decode("not a token")
+        self.assertEqual(self.verifier.cache.stats()["size"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,8 @@
 import unittest
 from datetime import datetime, timedelta
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, AsyncMock
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import Contact, User
 from src.schemas import UserModel
@@ -17,27 +17,28 @@ from src.repository.users import (
 class TestNotes(unittest.IsolatedAsyncioTestCase):
 
     def setUp(self):
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
+        self.session.execute.return_value = MagicMock()
 
     async def test_get_user_by_username(self):
         user = User(username="Test")
-        self.session.query().filter().first.return_value = user
+        self.session.execute.return_value.scalars().first.return_value = user
         result = await get_user_by_username(username=user.username, db=self.session)
         self.assertEqual(result, user)
 
     async def test_get_user_by_username_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.session.execute.return_value.scalars().first.return_value = None
         result = await get_user_by_username(username="test", db=self.session)
         self.assertIsNone(result)
 
     async def test_get_user_by_email(self):
         user = User(email="test_email")
-        self.session.query().filter().first.return_value = user
+        self.session.execute.return_value.scalars().first.return_value = user
         result = await get_user_by_email(email=user.email, db=self.session)
         self.assertEqual(result, user)
 
     async def test_get_user_by_email_not_found(self):
-        self.session.query().filter().first.return_value = None
+        self.session.execute.return_value.scalars().first.return_value = None
         result = await get_user_by_email(email="test", db=self.session)
         self.assertIsNone(result)
 
@@ -55,7 +56,7 @@ class TestNotes(unittest.IsolatedAsyncioTestCase):
 
     async def test_update_avatar(self):
         user = User(email="test")
-        self.session.query().filter().first.return_value = user
+        self.session.execute.return_value.scalars().first.return_value = user
         result = await update_avatar(user.email, "avatar_url", self.session)
         self.assertEqual(result.avatar, user.avatar)
 